@@ -0,0 +1,145 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+TOKEN_CACHE_KEY = 'auth:token:{digest}'
+
+
+class LocalTTLCache:
+    """Ограниченный по размеру LRU-кеш процесса с временем жизни записей."""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + self.timeout)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+class TokenCache:
+    """Двухуровневый кеш проверенных токенов.
+
+    В кеше процесса лежат готовые пользователь и токен, в общем кеше
+    TOKEN_CACHE_ALIAS — id пользователя и время создания токена.
+    Запись процесса действительна, пока есть запись общего кеша:
+    удаление из общего кеша сразу отзывает токен во всех воркерах.
+    """
+
+    def __init__(self):
+        self.local = LocalTTLCache(
+            settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_CACHE_TIMEOUT
+        )
+
+    @property
+    def shared(self):
+        return caches[settings.TOKEN_CACHE_ALIAS]
+
+    def get_key(self, token_key):
+        return TOKEN_CACHE_KEY.format(
+            digest=hashlib.sha256(token_key.encode()).hexdigest()
+        )
+
+    def get(self, token_key):
+        """Пара (пользователь, токен) из кеша процесса или None."""
+        key = self.get_key(token_key)
+        resolved = self.local.get(key)
+        if resolved is None:
+            return None
+        user, token = resolved
+        if self.shared.get(key) != (user.pk, token.created):
+            self.local.delete(key)
+            return None
+        # Копии, чтобы атрибуты одного запроса не попадали в другие.
+        user, token = copy.copy(user), copy.copy(token)
+        token.user = user
+        return user, token
+
+    def get_shared(self, token_key):
+        """Пара (id пользователя, время создания токена) или None."""
+        return self.shared.get(self.get_key(token_key))
+
+    def set(self, user, token):
+        key = self.get_key(token.key)
+        self.shared.set(
+            key, (user.pk, token.created), settings.TOKEN_CACHE_TIMEOUT
+        )
+        self.local.set(key, (user, token))
+
+    def set_local(self, user, token):
+        self.local.set(self.get_key(token.key), (user, token))
+
+    def delete(self, token_key):
+        key = self.get_key(token_key)
+        self.local.delete(key)
+        self.shared.delete(key)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запросов к базе для известных токенов.
+
+    Записи удаляются из кеша при выходе (удалении токена), деактивации
+    пользователя и смене пароля, см. api.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        resolved = token_cache.get(key)
+        if resolved is not None:
+            return resolved
+        cached = token_cache.get_shared(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(user, token)
+            return user, token
+        user_id, created = cached
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None or not user.is_active:
+            token_cache.delete(key)
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        token = self.build_token(key, user, created)
+        token_cache.set_local(user, token)
+        return user, token
+
+    def build_token(self, key, user, created):
+        """Токен из закешированных полей, как если бы он был прочитан."""
+        model = self.get_model()
+        token = model.from_db(
+            router.db_for_read(model), ('key', 'user_id', 'created'),
+            (key, user.pk, created),
+        )
+        token.user = user
+        return token
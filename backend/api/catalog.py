@@ -0,0 +1,161 @@
+import glob
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from foodgram.compression import accepted_encodings, brotli, compress
+from foodgram.db_routers import use_primary
+from recipes.caches import (aget_ingredient_list_version,
+                            get_ingredient_list_version)
+from recipes.models import Ingredient
+
+from .renderers import StreamingJSONRenderer
+from .serializers import IngredientSerializer
+
+CATALOG_FILE = 'ingredients-{version}.json'
+# Порядок — предпочтение при выборе сжатия для клиента.
+CATALOG_ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+CatalogSnapshot = namedtuple(
+    'CatalogSnapshot', ('version', 'etag', 'variants')
+)
+
+
+def compress_variants(content):
+    """Сжатые копии с наибольшей степенью: они строятся один раз."""
+    variants = {'gzip': compress(content, 'gzip', level=9)}
+    if brotli is not None:
+        variants['br'] = compress(content, 'br', level=11)
+    return variants
+
+
+class IngredientCatalog:
+    """Полный список ингредиентов в виде готового JSON и его сжатых копий.
+
+    Снимок строится при первом запросе после изменения справочника: его
+    версия — дайджест содержимого справочника из recipes.caches, поэтому
+    все процессы называют снимок одних данных одинаково. Файлы снимка
+    сохраняются в INGREDIENT_CATALOG_DIR, поэтому остальные процессы и
+    перезапущенные воркеры читают их с диска, а не из базы.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def get(self, version=None):
+        if version is None:
+            version = get_ingredient_list_version()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self.lock:
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = self.load(version) or self.build(version)
+            return self.snapshot
+
+    async def aget(self):
+        version = await aget_ingredient_list_version()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        return await sync_to_async(self.get)(version)
+
+    def get_path(self, version, suffix=''):
+        return os.path.join(
+            settings.INGREDIENT_CATALOG_DIR,
+            CATALOG_FILE.format(version=version) + suffix,
+        )
+
+    def make_snapshot(self, version, content, variants):
+        etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+        return CatalogSnapshot(
+            version, etag, {'identity': content, **variants}
+        )
+
+    def load(self, version):
+        try:
+            with open(self.get_path(version), 'rb') as file:
+                content = file.read()
+        except OSError:
+            return None
+        variants = {}
+        for encoding, suffix in CATALOG_ENCODINGS.items():
+            try:
+                with open(self.get_path(version, suffix), 'rb') as file:
+                    variants[encoding] = file.read()
+            except OSError:
+                continue
+        return self.make_snapshot(version, content, variants)
+
+    def build(self, version):
+        # Версия считается по основной базе, и содержимое читается с неё.
+        with use_primary():
+            content = b''.join(StreamingJSONRenderer().render_stream(
+                Ingredient.objects.all(), IngredientSerializer
+            ))
+        variants = compress_variants(content)
+        try:
+            self.save(version, content, variants)
+        except OSError:
+            # Без записи на диск снимок живёт только в памяти процесса.
+            pass
+        return self.make_snapshot(version, content, variants)
+
+    def save(self, version, content, variants):
+        os.makedirs(settings.INGREDIENT_CATALOG_DIR, exist_ok=True)
+        current = {self.get_path(version)}
+        # Несжатый файл пишется последним: по нему load() судит, что
+        # снимок записан целиком.
+        for encoding, data in (*variants.items(), ('identity', content)):
+            path = self.get_path(version, CATALOG_ENCODINGS.get(encoding, ''))
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, path)
+            current.add(path)
+        for path in glob.glob(self.get_path('*') + '*'):
+            if path not in current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+ingredient_catalog = IngredientCatalog()
+
+
+def catalog_response(request, snapshot):
+    """Ответ со снимком в подходящем клиенту сжатии и с ETag."""
+    if snapshot.etag in parse_etags(
+        request.META.get('HTTP_IF_NONE_MATCH', '')
+    ):
+        response = HttpResponseNotModified()
+    else:
+        encodings = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        encoding = next(
+            (
+                encoding for encoding in CATALOG_ENCODINGS
+                if encoding in encodings and encoding in snapshot.variants
+            ),
+            'identity',
+        )
+        response = HttpResponse(
+            snapshot.variants[encoding], content_type='application/json'
+        )
+        response['Content-Length'] = len(snapshot.variants[encoding])
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = snapshot.etag
+    # Сжатие уже выбрано по снимку, повторно ответ не сжимается.
+    response.compress_exempt = True
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
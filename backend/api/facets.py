@@ -0,0 +1,92 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Value, When
+from recipes.constants import COOKING_TIME_FACET_EDGES, FACET_AUTHORS_LIMIT
+from recipes.models import Recipe
+
+from .filters import USER_RECIPE_FILTERS
+
+FACETS_KEY = 'recipes:facets:{signature}'
+FACETS_TIMEOUT = 5 * 60
+
+
+def get_filter_signature(filterset):
+    """Подпись набора фильтров, не зависящая от порядка параметров.
+
+    Фильтры по избранному и корзине зависят от пользователя, поэтому
+    при их наличии в подпись входит его id.
+    """
+    params = {
+        name: sorted(value) if isinstance(value, list) else str(value)
+        for name, value in filterset.form.cleaned_data.items()
+        if value not in (None, '', [])
+    }
+    if params.keys() & USER_RECIPE_FILTERS.keys():
+        params['user'] = filterset.request.user.id
+    return hashlib.sha256(
+        json.dumps(params, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def cooking_time_bucket():
+    last = len(COOKING_TIME_FACET_EDGES) - 2
+    return Case(
+        *(
+            When(cooking_time__lt=upper, then=Value(number))
+            for number, upper in enumerate(COOKING_TIME_FACET_EDGES[1:-1])
+        ),
+        default=Value(last),
+        output_field=IntegerField(),
+    )
+
+
+def count_facets(queryset):
+    """Считает все фасеты одним сгруппированным запросом на фасет."""
+    buckets = dict(
+        queryset.annotate(bucket=cooking_time_bucket())
+        .values_list('bucket').annotate(count=Count('id')).order_by()
+    )
+    edges = COOKING_TIME_FACET_EDGES
+    cooking_time = [
+        {
+            'min': lower,
+            'max': upper - 1 if number < len(edges) - 2 else upper,
+            'count': buckets.get(number, 0),
+        }
+        for number, (lower, upper) in enumerate(zip(edges, edges[1:]))
+    ]
+    tags = [
+        {'slug': slug, 'name': name, 'count': count}
+        for slug, name, count in (
+            Recipe.tags.through.objects.filter(
+                recipe_id__in=queryset.values('id')
+            ).values_list('tag__slug', 'tag__name')
+            .annotate(count=Count('id')).order_by('-count', 'tag__slug')
+        )
+    ]
+    authors = [
+        {'id': author_id, 'username': username, 'count': count}
+        for author_id, username, count in (
+            queryset.values_list('author_id', 'author__username')
+            .annotate(count=Count('id'))
+            .order_by('-count', 'author_id')[:FACET_AUTHORS_LIMIT]
+        )
+    ]
+    return {
+        'count': sum(buckets.values()),
+        'tags': tags,
+        'cooking_time': cooking_time,
+        'authors': authors,
+    }
+
+
+def get_facets(filterset):
+    """Фасеты для набора фильтров с кешированием по его подписи."""
+    key = FACETS_KEY.format(signature=get_filter_signature(filterset))
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(filterset.qs)
+        cache.set(key, facets, FACETS_TIMEOUT)
+    return facets
@@ -1,5 +1,12 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.caches import get_tag_choices, get_tag_ids, get_user_recipe_ids
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+
+USER_RECIPE_FILTERS = {
+    'is_favorited': Favorite,
+    'is_in_shopping_cart': ShoppingCart,
+}
 
 
 class IngredientFilter(FilterSet):
@@ -16,15 +23,86 @@ class RecipeFilter(FilterSet):
     """Фильтр для модели Recipe."""
 
     author = filters.NumberFilter(field_name='author__id')
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    cooking_time = filters.RangeFilter(field_name='cooking_time')
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='filter_tags',
     )
-    is_favorited = filters.BooleanFilter(field_name='is_favorited')
+    is_favorited = filters.BooleanFilter(method='filter_user_recipes')
     is_in_shopping_cart = filters.BooleanFilter(
-        field_name='is_in_shopping_cart')
+        method='filter_user_recipes')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart',
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tag_ids = self.get_tag_ids()
+        self.filters['tags'].extra['choices'] = [
+            (slug, slug) for slug in self.tag_ids
+        ]
+
+    def get_tag_ids(self):
+        """Словарь тегов, загруженный асинхронным обработчиком, или кеш.
+
+        Запрошенные слаги передаются в кеш, чтобы тег, созданный после
+        кеширования словаря, не отклонялся как неизвестный.
+        """
+        tag_ids = getattr(self.request, 'tag_ids', None)
+        if tag_ids is not None:
+            return tag_ids
+        # Без параметров запроса FilterSet хранит data как пустой dict.
+        return get_tag_ids(
+            self.data.getlist('tags') if hasattr(self.data, 'getlist')
+            else ()
+        )
+
+    def get_user_recipe_ids(self, model):
+        user_recipe_ids = getattr(self.request, 'user_recipe_ids', None)
+        if user_recipe_ids is not None:
+            return user_recipe_ids[model]
+        user = self.request.user
+        return (
+            get_user_recipe_ids(model, user.id)
+            if user.is_authenticated else frozenset()
+        )
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов без дублей строк.
+
+        Слаги переводятся в id по закешированному словарю тегов, а сам
+        отбор выполняется полусоединением EXISTS по таблице связи
+        рецепт-тег, поэтому DISTINCT и подсчёт дублей не нужны.
+        """
+        tag_ids = self.tag_ids
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[
+                    tag_ids[slug] for slug in value if slug in tag_ids
+                ],
+            )
+        ))
+
+    def filter_user_recipes(self, queryset, name, value):
+        """Фильтр по избранному и корзине из кеша id рецептов.
+
+        Закешированное множество подставляется в запрос как id IN (...),
+        а слишком большое, которое не кешируется, заменяется соединением
+        с таблицей связи.
+        """
+        model = USER_RECIPE_FILTERS[name]
+        user = self.request.user
+        recipe_ids = self.get_user_recipe_ids(model)
+        if recipe_ids is None:
+            relation = model._meta.get_field('recipe').related_query_name()
+            lookup = {f'{relation}__user': user}
+        else:
+            lookup = {'id__in': recipe_ids}
+        if value:
+            return queryset.filter(**lookup)
+        return queryset.exclude(**lookup)
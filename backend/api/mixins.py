@@ -0,0 +1,102 @@
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+
+class AsyncReadMixin:
+    """Асинхронные обработчики чтения для запуска под ASGI.
+
+    Для каждого действия из async_actions вьюсет определяет корутину
+    с префиксом a: alist, aretrieve. При SERVER_MODE=asgi такие запросы
+    выполняются в цикле событий: проверки APIView.initial выполняются
+    в потоке, а база и кеш в обработчике читаются через асинхронные
+    интерфейсы. Остальные действия обрабатываются синхронным
+    представлением в потоке.
+    """
+
+    async_actions = ()
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        sync_view = super().as_view(actions, **initkwargs)
+        if settings.SERVER_MODE != 'asgi' or not any(
+            action in cls.async_actions for action in actions.values()
+        ):
+            return sync_view
+        sync_handler = sync_to_async(sync_view)
+        action_map = dict(actions)
+        if 'get' in action_map:
+            action_map.setdefault('head', action_map['get'])
+
+        async def view(request, *args, **kwargs):
+            if action_map.get(request.method.lower()) not in (
+                cls.async_actions
+            ):
+                return await sync_handler(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = action_map
+            for method, action in action_map.items():
+                setattr(self, method, getattr(self, action))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        update_wrapper(view, cls, updated=())
+        update_wrapper(view, cls.dispatch, assigned=())
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        # csrf_exempt в Django 4.2 оборачивает корутину синхронной
+        # функцией, поэтому признак ставится напрямую.
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Асинхронный вариант APIView.dispatch.
+
+        Проверки APIView.initial (согласование формата, аутентификация,
+        права, троттлинг) выполняются в потоке, как в синхронном
+        представлении. Для ответов не в JSON (browsable API) вызывается
+        синхронный обработчик действия.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.accepted_renderer.format == 'json':
+                handler = getattr(self, f'a{self.action}')
+            else:
+                handler = sync_to_async(getattr(self, self.action))
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.render_response(self.response)
+
+    def render_response(self, response):
+        """Рендерит ответ в цикле событий.
+
+        Django выполняет render() у ответа асинхронного представления
+        в отдельном потоке, поэтому возвращается готовый HttpResponse
+        с теми же заголовками и cookie. Ответы без render() уже готовы
+        и возвращаются как есть.
+        """
+        if not hasattr(response, 'render'):
+            return response
+        response.render()
+        rendered = HttpResponse(
+            response.content, status=response.status_code,
+            reason=response.reason_phrase, charset=response.charset,
+        )
+        rendered.headers = response.headers
+        rendered.cookies = response.cookies
+        rendered.compress_exempt = getattr(response, 'compress_exempt', False)
+        return rendered
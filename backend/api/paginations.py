@@ -1,5 +1,116 @@
-from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageSizeLimitPagination(PageNumberPagination):
+    """Постраничная пагинация с размером страницы из параметра limit.
+
+    limit не больше max_page_size представления, а если он не задан —
+    MAX_PAGE_SIZE из настроек.
+    """
+
+    page_size_query_param = 'limit'
+
+    def get_page_size(self, request):
+        view = request.parser_context.get('view')
+        self.max_page_size = (
+            getattr(view, 'max_page_size', None) or settings.MAX_PAGE_SIZE
+        )
+        return super().get_page_size(request)
+
+    def paginate_known_page(self, count, object_list, request):
+        """Первая страница, число записей и объекты которой уже известны."""
+        self.request = request
+        paginator = self.django_paginator_class(
+            range(count), self.get_page_size(request)
+        )
+        self.page = paginator.page(1)
+        self.page.object_list = object_list
+        return object_list
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset.
+
+        Число записей и страница запрашиваются через асинхронный ORM,
+        поэтому пагинатор получает уже посчитанное количество.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+        return list(self.page)
+
+
+class FeedCursorPagination(BasePagination):
+    """Пагинация ленты по курсору — id последнего показанного рецепта."""
+
+    cursor_query_param = 'cursor'
     page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return int(force_str(urlsafe_base64_decode(encoded)))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_recipe_ids(self, get_recipe_ids, request):
+        """Получает id страницы через get_recipe_ids(before, limit)."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        recipe_ids = get_recipe_ids(self.get_cursor(request), page_size + 1)
+        self.next_cursor = (
+            recipe_ids[page_size - 1] if len(recipe_ids) > page_size
+            else None
+        )
+        return recipe_ids[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            urlsafe_base64_encode(force_bytes(self.next_cursor)),
+        )
+
+    def get_previous_link(self):
+        return None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
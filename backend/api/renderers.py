@@ -0,0 +1,58 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+STREAM_CHUNK_SIZE = 1000
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+async def iterate_in_thread(iterator):
+    """Асинхронный итератор поверх синхронного.
+
+    Каждая часть читается в потоке запроса, поэтому курсор базы данных
+    остаётся в том же соединении, а ответ не собирается целиком.
+    """
+    next_part = sync_to_async(next)
+    while (part := await next_part(iterator, None)) is not None:
+        yield part
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """Рендерит JSON-массив по частям, не собирая весь список в памяти.
+
+    Объекты читаются через QuerySet.iterator(chunk_size) и сериализуются
+    пачками по chunk_size; каждая пачка отдаётся фрагментом массива в
+    том же виде, что и у JSONRenderer.
+    """
+
+    def render_stream(self, queryset, serializer_class, context=None,
+                      chunk_size=STREAM_CHUNK_SIZE):
+        yield b'['
+        separator = b''
+        for chunk in chunked(
+            queryset.iterator(chunk_size=chunk_size), chunk_size
+        ):
+            data = serializer_class(chunk, many=True, context=context).data
+            yield separator + self.render(data)[1:-1]
+            separator = b','
+        yield b']'
+
+
+def stream_json(queryset, serializer_class, context=None,
+                chunk_size=STREAM_CHUNK_SIZE):
+    """Потоковый ответ с JSON-массивом объектов queryset."""
+    content = StreamingJSONRenderer().render_stream(
+        queryset, serializer_class, context, chunk_size
+    )
+    if settings.SERVER_MODE == 'asgi':
+        # Синхронный итератор под ASGI Django сначала читает целиком.
+        content = iterate_in_thread(content)
+    return StreamingHttpResponse(content, content_type='application/json')
@@ -1,7 +1,10 @@
 from collections import Counter
 
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from recipes.constants import MIN_VALUE
+from recipes.caches import get_user_recipe_ids
+from recipes.constants import MIN_VALUE, PANTRY_MAX_INGREDIENTS
+from recipes.duplicates import find_duplicates
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Subscribe, Tag, User)
 from rest_framework import serializers
@@ -30,10 +33,11 @@ class UserProfileSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and Subscribe.objects.filter(user=user, author=obj).exists()
-        )
+        if not user.is_authenticated:
+            return False
+        if 'subscribed_ids' in self.context:
+            return obj.id in self.context['subscribed_ids']
+        return Subscribe.objects.filter(user=user, author=obj).exists()
 
 
 class SetAvatarSerializer(serializers.ModelSerializer):
@@ -74,14 +78,13 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
 class UserSubscribeRepresentationSerializer(UserProfileSerializer):
     """Сериализатор отображения подписки и рецептов автора"""
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True
-    )
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count', 'avatar',)
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'subscribers_count', 'avatar',)
+        read_only_fields = ('recipes_count', 'subscribers_count')
 
     def get_recipes(self, obj):
         request = self.context.get('request')
@@ -139,15 +142,17 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeDetailSerializer(serializers.ModelSerializer):
-    """Сериализатор деталей рецепта."""
+    """Сериализатор деталей рецепта.
+
+    Если в контексте есть recipe_fields, выводятся только эти поля.
+    """
     tags = TagSerializer(many=True, read_only=True)
     author = UserProfileSerializer(read_only=True)
     ingredients = RecipeIngredientSerializer(
         many=True, source='recipe_ingredients', read_only=True
     )
-    is_favorited = serializers.BooleanField(read_only=True, default=False)
-    is_in_shopping_cart = serializers.BooleanField(
-        read_only=True, default=False)
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
     image = serializers.ImageField(read_only=True)
 
     class Meta:
@@ -155,7 +160,67 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'favorites_count', 'carts_count',
+        )
+        read_only_fields = ('favorites_count', 'carts_count')
+
+    # Поля облегчённых представлений, выбираемых параметром view.
+    representations = {
+        'card': (
+            'id', 'author', 'is_favorited', 'is_in_shopping_cart', 'name',
+            'image', 'cooking_time',
+        ),
+    }
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = self.context.get('recipe_fields')
+        if names is None:
+            return fields
+        return {
+            name: field for name, field in fields.items() if name in names
+        }
+
+    def get_user_recipe_ids(self, model):
+        """Id рецептов пользователя, один раз на весь список.
+
+        Если множество слишком велико для кеша, id выбираются одним
+        запросом только среди рецептов списка.
+        """
+        key = f'{model._meta.model_name}_ids'
+        if key not in self.context:
+            user = self.context['request'].user
+            self.context[key] = (
+                get_user_recipe_ids(model, user.id)
+                if user.is_authenticated else frozenset()
+            )
+        if self.context[key] is None:
+            return self.get_listed_user_recipe_ids(model)
+        return self.context[key]
+
+    def get_listed_user_recipe_ids(self, model):
+        # Контекст бывает общим для нескольких списков (export), поэтому
+        # id хранятся в самом списке.
+        owner = (
+            self.parent if isinstance(self.parent, serializers.ListSerializer)
+            else self
         )
+        attr = f'_listed_{model._meta.model_name}_ids'
+        if not hasattr(owner, attr):
+            recipes = owner.instance if owner is not self else [self.instance]
+            setattr(owner, attr, frozenset(
+                model.objects.filter(
+                    user=self.context['request'].user,
+                    recipe_id__in=[recipe.id for recipe in recipes],
+                ).values_list('recipe_id', flat=True)
+            ))
+        return getattr(owner, attr)
+
+    def get_is_favorited(self, obj):
+        return obj.id in self.get_user_recipe_ids(Favorite)
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in self.get_user_recipe_ids(ShoppingCart)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
@@ -167,6 +232,39 @@ class RecipeShortSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class SimilarRecipeSerializer(RecipeShortSerializer):
+    """Сериализатор похожего рецепта."""
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ('similarity',)
+
+
+class PantryRecipeSerializer(RecipeShortSerializer):
+    """Сериализатор рецепта в подборке по имеющимся ингредиентам."""
+    matched = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    coverage = serializers.SerializerMethodField()
+    missing = IngredientSerializer(many=True, read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + (
+            'matched', 'total', 'coverage', 'missing',
+        )
+
+    def get_coverage(self, obj):
+        return round(obj.matched / obj.total, 3)
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    """Сериализатор списка имеющихся ингредиентов."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=MIN_VALUE),
+        allow_empty=False,
+        max_length=PANTRY_MAX_INGREDIENTS,
+    )
+
+
 class RecipeCreateUpdateDetailSerializer(serializers.ModelSerializer):
     """Сериализатор создания и обновления рецепта."""
     tags = serializers.PrimaryKeyRelatedField(
@@ -239,6 +337,7 @@ class RecipeCreateUpdateDetailSerializer(serializers.ModelSerializer):
             ) for ingredient_data in ingredients
         ])
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -247,8 +346,14 @@ class RecipeCreateUpdateDetailSerializer(serializers.ModelSerializer):
         )
         recipe.tags.set(tags)
         self.assign_ingredients_to_recipe(recipe, ingredients_data)
+        recipe.possible_duplicates = find_duplicates(
+            recipe.name,
+            [ingredient['ingredient'].id for ingredient in ingredients_data],
+            exclude_id=recipe.id,
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -259,7 +364,12 @@ class RecipeCreateUpdateDetailSerializer(serializers.ModelSerializer):
         return instance
 
     def to_representation(self, instance):
-        return RecipeDetailSerializer(instance, context=self.context).data
+        data = RecipeDetailSerializer(instance, context=self.context).data
+        if hasattr(instance, 'possible_duplicates'):
+            data['possible_duplicates'] = SimilarRecipeSerializer(
+                instance.possible_duplicates, many=True, context=self.context
+            ).data
+        return data
 
 
 class BaseRecipeActionSerializer(serializers.ModelSerializer):
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from recipes.models import User
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+# Поля пользователя, изменение которых отзывает закешированные токены.
+AUTH_FIELDS = frozenset(('is_active', 'password'))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(pre_save, sender=User)
+def user_auth_changing(sender, instance, using, update_fields=None,
+                       **kwargs):
+    instance._auth_changed = False
+    if instance._state.adding or (
+        update_fields is not None and not AUTH_FIELDS & set(update_fields)
+    ):
+        return
+    stored = User.objects.using(using).filter(pk=instance.pk).values_list(
+        'is_active', 'password'
+    ).first()
+    instance._auth_changed = stored != (instance.is_active, instance.password)
+
+
+@receiver(post_save, sender=User)
+def user_auth_changed(sender, instance, created, **kwargs):
+    if not getattr(instance, '_auth_changed', False):
+        return
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+    def invalidate():
+        for key in keys:
+            token_cache.delete(key)
+
+    # Сразу и после коммита: до коммита кеш мог заполниться из старых
+    # данных параллельным запросом.
+    invalidate()
+    transaction.on_commit(invalidate)
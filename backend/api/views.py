@@ -1,28 +1,59 @@
+from api.catalog import catalog_response, ingredient_catalog
+from api.facets import get_facets
 from api.filters import IngredientFilter, RecipeFilter
+from api.mixins import AsyncReadMixin
+from api.paginations import FeedCursorPagination
 from api.permissions import IsAdminAuthorOrReadOnly
+from api.renderers import stream_json
 from api.serializers import (FavoriteRecipeSerializer, IngredientSerializer,
+                             PantryQuerySerializer, PantryRecipeSerializer,
                              RecipeCreateUpdateDetailSerializer,
                              RecipeDetailSerializer,
                              RecipeShoppingCartSerializer, SetAvatarSerializer,
-                             TagSerializer, UserProfileSerializer,
+                             SimilarRecipeSerializer, TagSerializer,
+                             UserProfileSerializer,
                              UserSubscribeRepresentationSerializer,
                              UserSubscribeSerializer)
-from django.db.models import BooleanField, Exists, OuterRef, Sum, Value
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import F, Sum
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
+from recipes.caches import (INGREDIENT_LIST_HARD_TIMEOUT,
+                            INGREDIENT_LIST_SOFT_TIMEOUT,
+                            RECIPE_FIRST_PAGE_HARD_TIMEOUT,
+                            RECIPE_FIRST_PAGE_KEY,
+                            RECIPE_FIRST_PAGE_SOFT_TIMEOUT,
+                            TAG_LIST_HARD_TIMEOUT, TAG_LIST_KEY,
+                            TAG_LIST_SOFT_TIMEOUT, aget_ingredient_list_key,
+                            aget_tag_ids, aget_user_recipe_ids,
+                            get_ingredient_list_key)
+from recipes.feeds import get_feed_recipe_ids
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Subscribe, Tag, User)
+from recipes.pantry import pantry_index
+from recipes.stale_cache import aget_or_refresh, get_or_refresh
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 
+def get_all_subscribed_ids(user):
+    return frozenset(Subscribe.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    ))
+
+
+def split_param(value):
+    """Множество непустых значений параметра, перечисленных через запятую."""
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
 class UserViewSet(DjoserUserViewSet):
     """Вьюсет для работы с пользователями, включая подписки и аватары."""
     queryset = User.objects.all()
@@ -50,11 +81,24 @@ class UserViewSet(DjoserUserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAdminUser,)
+    )
+    def export(self, request):
+        """Все пользователи одним JSON-массивом, потоком без пагинации."""
+        return stream_json(User.objects.all(), UserProfileSerializer, {
+            'request': request,
+            'subscribed_ids': get_all_subscribed_ids(request.user),
+        })
+
     @action(
         detail=True,
         methods=('post',),
         permission_classes=(IsAuthenticated,)
     )
+    @transaction.atomic
     def subscribe(self, request, id=None):
         author = get_object_or_404(User, id=id)
         data = {'user': request.user.id, 'author': author.id}
@@ -69,6 +113,7 @@ class UserViewSet(DjoserUserViewSet):
         )
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def unsubscribe(self, request, id=None):
         author = get_object_or_404(User, id=id)
         deleted, _ = Subscribe.objects.filter(
@@ -98,15 +143,31 @@ class UserViewSet(DjoserUserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для просмотра тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
+    async_actions = ('list',)
+
+    def build_list(self):
+        return list(self.get_serializer(self.get_queryset(), many=True).data)
+
+    def list(self, request, *args, **kwargs):
+        return Response(get_or_refresh(
+            TAG_LIST_KEY, self.build_list,
+            TAG_LIST_SOFT_TIMEOUT, TAG_LIST_HARD_TIMEOUT,
+        ))
+
+    async def alist(self, request):
+        return Response(await aget_or_refresh(
+            TAG_LIST_KEY, self.build_list,
+            TAG_LIST_SOFT_TIMEOUT, TAG_LIST_HARD_TIMEOUT,
+        ))
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для просмотра ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -114,45 +175,252 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
     permission_classes = (AllowAny,)
+    async_actions = ('list',)
 
+    def build_list(self):
+        return list(self.get_serializer(
+            self.filter_queryset(self.get_queryset()), many=True
+        ).data)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def is_catalog_request(self, request):
+        """Полный список в JSON отдаётся готовым снимком справочника."""
+        return (
+            not request.query_params.get('name')
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.is_catalog_request(request):
+            return catalog_response(request, ingredient_catalog.get())
+        return Response(get_or_refresh(
+            get_ingredient_list_key(request.query_params.get('name', '')),
+            self.build_list,
+            INGREDIENT_LIST_SOFT_TIMEOUT, INGREDIENT_LIST_HARD_TIMEOUT,
+        ))
+
+    async def alist(self, request):
+        if self.is_catalog_request(request):
+            return catalog_response(request, await ingredient_catalog.aget())
+        key = await aget_ingredient_list_key(
+            request.query_params.get('name', '')
+        )
+        return Response(await aget_or_refresh(
+            key, self.build_list,
+            INGREDIENT_LIST_SOFT_TIMEOUT, INGREDIENT_LIST_HARD_TIMEOUT,
+        ))
+
+
+class RecipeViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
     permission_classes = (IsAdminAuthorOrReadOnly,)
     http_method_names = ['get', 'post', 'patch', 'delete']
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    lookup_value_regex = r'\d+'
+    max_page_size = 50
+    async_actions = ('list', 'retrieve')
+    read_actions = ('list', 'retrieve', 'popular', 'feed')
 
-    def get_queryset(self):
-        user_id = self.request.user.id
-        queryset = Recipe.objects.select_related('author').prefetch_related(
-            'tags', 'recipe_ingredients__ingredient'
-        )
-
-        if user_id:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user_id=user_id, recipe=OuterRef('pk'))
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user_id=user_id, recipe=OuterRef('pk'))
-                )
+    def get_recipe_fields(self):
+        """Поля рецепта по параметрам view, fields и omit.
+
+        view=card выбирает облегчённое представление, fields задаёт
+        список полей вместо него, omit исключает поля. None — все поля.
+        """
+        params = self.request.query_params
+        view = params.get('view')
+        requested = split_param(params.get('fields', ''))
+        omitted = split_param(params.get('omit', ''))
+        if view is None and not requested and not omitted:
+            return None
+        all_fields = RecipeDetailSerializer.Meta.fields
+        representations = RecipeDetailSerializer.representations
+        if view is not None and view not in representations:
+            raise ValidationError(
+                {'view': f'Неизвестное представление: {view}.'}
             )
-        else:
-            queryset = queryset.annotate(
-                is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
+        unknown = (requested | omitted).difference(all_fields)
+        if unknown:
+            raise ValidationError(
+                {'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}.'}
             )
+        fields = requested or set(representations.get(view, all_fields))
+        return frozenset(fields - omitted)
 
-        return queryset
+    def get_queryset(self):
+        fields = (
+            self.get_recipe_fields() if self.action in self.read_actions
+            else None
+        )
+        if fields is None:
+            return Recipe.objects.select_related('author').prefetch_related(
+                'tags', 'recipe_ingredients__ingredient'
+            )
+        recipes = Recipe.objects.defer(*(
+            field.name for field in Recipe._meta.concrete_fields
+            if not field.primary_key and not field.is_relation
+            and field.name in RecipeDetailSerializer.Meta.fields
+            and field.name not in fields
+        ))
+        if 'author' in fields:
+            recipes = recipes.select_related('author')
+        if 'tags' in fields:
+            recipes = recipes.prefetch_related('tags')
+        if 'ingredients' in fields:
+            recipes = recipes.prefetch_related(
+                'recipe_ingredients__ingredient'
+            )
+        return recipes
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in self.read_actions:
             return RecipeDetailSerializer
         return RecipeCreateUpdateDetailSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.read_actions:
+            context['recipe_fields'] = self.get_recipe_fields()
+        return context
+
+    def needs_subscribed_ids(self):
+        fields = self.get_recipe_fields()
+        return self.request.user.is_authenticated and (
+            fields is None or 'author' in fields
+        )
+
+    def get_subscribed_ids(self, recipes):
+        """Id авторов рецептов, на которых подписан пользователь."""
+        return Subscribe.objects.filter(
+            user_id=self.request.user.id,
+            author_id__in={recipe.author_id for recipe in recipes},
+        ).values_list('author_id', flat=True)
+
+    def get_serializer(self, *args, **kwargs):
+        """Подписки на авторов страницы читаются одним запросом."""
+        serializer = super().get_serializer(*args, **kwargs)
+        instance = args[0] if args else kwargs.get('instance')
+        if (
+            self.action in self.read_actions and instance is not None
+            and self.needs_subscribed_ids()
+        ):
+            recipes = instance if kwargs.get('many') else [instance]
+            serializer.context['subscribed_ids'] = frozenset(
+                self.get_subscribed_ids(recipes)
+            )
+        return serializer
+
+    async def aload_user_data(self, request):
+        """Загружает теги и рецепты пользователя из кеша до фильтрации.
+
+        Фильтр и сериализатор берут их из запроса и контекста, а не
+        обращаются к кешу и базе синхронно.
+        """
+        user = request.user
+        request.tag_ids = await aget_tag_ids(
+            request.query_params.getlist('tags')
+        )
+        request.user_recipe_ids = {
+            model: (
+                await aget_user_recipe_ids(model, user.id)
+                if user.is_authenticated else frozenset()
+            )
+            for model in (Favorite, ShoppingCart)
+        }
+
+    async def aget_serializer_context(self, request, recipes):
+        context = self.get_serializer_context()
+        for model, recipe_ids in request.user_recipe_ids.items():
+            if recipe_ids is None:
+                # Множество не кешируется: нужны только рецепты страницы.
+                recipe_ids = frozenset([
+                    recipe_id async for recipe_id in
+                    model.objects.filter(
+                        user=request.user,
+                        recipe_id__in=[recipe.id for recipe in recipes],
+                    ).values_list('recipe_id', flat=True)
+                ])
+            context[f'{model._meta.model_name}_ids'] = recipe_ids
+        if self.needs_subscribed_ids():
+            context['subscribed_ids'] = frozenset([
+                author_id async for author_id
+                in self.get_subscribed_ids(recipes)
+            ])
+        return context
+
+    def is_first_page(self, request):
+        """Первая страница без фильтров с размером по умолчанию.
+
+        Параметры выбора полей на состав страницы не влияют.
+        """
+        params = request.query_params
+        return (
+            set(params) <= {'page', 'limit', 'view', 'fields', 'omit'}
+            and params.get('page', '1') == '1'
+            and self.paginator.get_page_size(request) == (
+                self.paginator.page_size
+            )
+        )
+
+    def build_first_page(self):
+        recipes = Recipe.objects.all()
+        return recipes.count(), list(
+            recipes.values_list('id', flat=True)[:self.paginator.page_size]
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_first_page(request):
+            return super().list(request, *args, **kwargs)
+        count, recipe_ids = get_or_refresh(
+            RECIPE_FIRST_PAGE_KEY, self.build_first_page,
+            RECIPE_FIRST_PAGE_SOFT_TIMEOUT, RECIPE_FIRST_PAGE_HARD_TIMEOUT,
+        )
+        page = self.paginator.paginate_known_page(
+            count, list(self.get_queryset().filter(id__in=recipe_ids)),
+            request,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    async def alist(self, request):
+        await self.aload_user_data(request)
+        if self.is_first_page(request):
+            count, recipe_ids = await aget_or_refresh(
+                RECIPE_FIRST_PAGE_KEY, self.build_first_page,
+                RECIPE_FIRST_PAGE_SOFT_TIMEOUT,
+                RECIPE_FIRST_PAGE_HARD_TIMEOUT,
+            )
+            page = self.paginator.paginate_known_page(count, [
+                recipe async for recipe in
+                self.get_queryset().filter(id__in=recipe_ids)
+            ], request)
+        else:
+            page = await self.paginator.apaginate_queryset(
+                self.filter_queryset(self.get_queryset()), request,
+                view=self,
+            )
+        serializer = RecipeDetailSerializer(
+            page, many=True,
+            context=await self.aget_serializer_context(request, page),
+        )
+        return self.get_paginated_response(serializer.data)
+
+    async def aretrieve(self, request, pk=None):
+        await self.aload_user_data(request)
+        try:
+            recipe = await self.filter_queryset(self.get_queryset()).aget(
+                pk=pk
+            )
+        except Recipe.DoesNotExist:
+            raise Http404('No Recipe matches the given query.')
+        self.check_object_permissions(request, recipe)
+        serializer = RecipeDetailSerializer(
+            recipe,
+            context=await self.aget_serializer_context(request, [recipe]),
+        )
+        return Response(serializer.data)
+
+    @transaction.atomic
     def add_recipe_to(self, model, serializer_class, request, pk):
         recipe = get_object_or_404(Recipe, id=pk)
         data = {'user': request.user.id, 'recipe': recipe.id}
@@ -164,6 +432,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def remove_recipe_from(self, model, request, pk, error_message):
         recipe = get_object_or_404(Recipe, id=pk)
         instance = model.objects.filter(user=request.user, recipe=recipe)
@@ -204,6 +473,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShoppingCart, request, pk, error_message
         )
 
+    @staticmethod
+    def get_shopping_cart_ingredients(user):
+        return (
+            RecipeIngredient.objects.filter(recipe__carts__user=user)
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(amount=Sum('amount'))
+            .order_by('ingredient__name')
+        )
+
     @action(
         detail=False,
         methods=('get',),
@@ -211,12 +489,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
         user = request.user
-        ingredients = (
-            RecipeIngredient.objects.filter(recipe__carts__user=user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
-            .order_by('ingredient__name')
-        )
+        ingredients = self.get_shopping_cart_ingredients(user)
 
         if not ingredients.exists():
             raise ValidationError('Ваш список покупок пуст.')
@@ -235,6 +508,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         return response
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAdminUser,)
+    )
+    def export(self, request):
+        """Все рецепты с учётом фильтров одним JSON-массивом, потоком."""
+        context = self.get_serializer_context()
+        context['subscribed_ids'] = get_all_subscribed_ids(request.user)
+        return stream_json(
+            self.filter_queryset(self.get_queryset()),
+            RecipeDetailSerializer, context,
+        )
+
+    @action(detail=False, methods=('get',))
+    def popular(self, request):
+        queryset = self.filter_queryset(
+            self.get_queryset().filter(popularity__isnull=False)
+        ).order_by('-popularity__score', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        pagination = FeedCursorPagination()
+        recipe_ids = pagination.paginate_recipe_ids(
+            lambda before, limit: get_feed_recipe_ids(
+                request.user, before, limit
+            ),
+            request,
+        )
+        recipes = self.get_queryset().filter(id__in=recipe_ids)
+        serializer = self.get_serializer(recipes, many=True)
+        return pagination.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=('get',))
+    def facets(self, request):
+        filterset = self.filterset_class(
+            request.query_params, queryset=Recipe.objects.all(),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return Response(get_facets(filterset))
+
+    @action(detail=True, methods=('get',))
+    def similar(self, request, pk=None):
+        recipes = list(
+            Recipe.objects.filter(similar_to__recipe_id=pk)
+            .annotate(similarity=F('similar_to__score'))
+            .order_by('-similarity')
+        )
+        if not recipes:
+            get_object_or_404(Recipe, id=pk)
+        serializer = SimilarRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=('get',))
+    def pantry(self, request):
+        query = PantryQuerySerializer(data={'ingredients': [
+            value
+            for values in request.query_params.getlist('ingredients')
+            for value in values.split(',') if value
+        ]})
+        query.is_valid(raise_exception=True)
+        page = self.paginate_queryset(
+            pantry_index.search(query.validated_data['ingredients'])
+        )
+        recipes = Recipe.objects.in_bulk([match.recipe_id for match in page])
+        ingredients = Ingredient.objects.in_bulk({
+            ingredient_id
+            for match in page for ingredient_id in match.missing_ids
+        })
+        results = []
+        for match in page:
+            # Рецепт могли удалить после обновления индекса.
+            recipe = recipes.get(match.recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched = match.matched
+            recipe.total = match.total
+            recipe.missing = [
+                ingredients[ingredient_id]
+                for ingredient_id in match.missing_ids
+            ]
+            results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=('get',),
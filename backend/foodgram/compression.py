@@ -0,0 +1,108 @@
+import zlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Порядок — предпочтение при выборе сжатия для клиента.
+ENCODINGS = ('br', 'gzip')
+# Заголовок gzip вместо zlib в zlib.compressobj.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+def choose_encoding(header):
+    """Лучшее доступное сжатие из принимаемых клиентом или None."""
+    encodings = accepted_encodings(header)
+    for encoding in ENCODINGS:
+        if encoding in encodings and (encoding != 'br' or brotli):
+            return encoding
+    return None
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    def process(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def get_compressor(encoding, level=None):
+    """Потоковый компрессор с уровнем из настроек COMPRESSION_*."""
+    if encoding == 'br':
+        return BrotliCompressor(
+            settings.COMPRESSION_BROTLI_QUALITY if level is None else level
+        )
+    return GzipCompressor(
+        settings.COMPRESSION_GZIP_LEVEL if level is None else level
+    )
+
+
+def compress(content, encoding, level=None):
+    compressor = get_compressor(encoding, level)
+    return compressor.process(content) + compressor.finish()
+
+
+def compress_exempt(view_func):
+    """Отключает сжатие ответов представления в CompressionMiddleware.
+
+    Подходит и для функций-представлений, и для действий вьюсетов.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            response = await view_func(*args, **kwargs)
+            response.compress_exempt = True
+            return response
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        response = view_func(*args, **kwargs)
+        response.compress_exempt = True
+        return response
+
+    return wrapper
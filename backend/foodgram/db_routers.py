@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULT_DB_ALIAS = 'default'
+REPLICA_DB_ALIAS = 'replica'
+# Только что выданный токен или созданная сессия могут ещё не дойти
+# до реплики.
+PRIMARY_ONLY_APPS = ('authtoken', 'sessions')
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Чтение на основной базе внутри блока, даже в безопасном запросе.
+
+    Нужно для заполнения кешей: значение, прочитанное с отстающей реплики
+    сразу после сброса, хранилось бы в кеше весь срок записи.
+    """
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Направляет чтение безопасных запросов на реплику.
+
+    Запись, select_for_update и любые запросы вне безопасного
+    HTTP-запроса выполняются на основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            read_from_replica.get()
+            and REPLICA_DB_ALIAS in settings.DATABASES
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,46 @@
+"""Настройки Gunicorn: gunicorn -c python:foodgram.gunicorn_conf.
+
+Режим задаётся переменной SERVER_MODE:
+sync — синхронные процессы, по 2 * CPU + 1;
+threaded — процессы с потоками gthread, по CPU + 1 с GUNICORN_THREADS
+потоками в каждом;
+asgi — процессы uvicorn по одному на CPU с приложением foodgram.asgi.
+
+С кешем процесса (CACHE_BACKEND=locmem) по умолчанию запускается один
+процесс: инвалидация кешей в нём не доходит до других воркеров.
+"""
+import os
+
+SERVER_MODES = {
+    'sync': ('foodgram.wsgi:application', 'sync'),
+    'threaded': ('foodgram.wsgi:application', 'gthread'),
+    'asgi': ('foodgram.asgi:application', 'uvicorn.workers.UvicornWorker'),
+}
+
+server_mode = os.getenv('SERVER_MODE', 'sync')
+if server_mode not in SERVER_MODES:
+    raise ValueError(
+        f'Неизвестный SERVER_MODE: {server_mode}. '
+        f'Доступны: {", ".join(SERVER_MODES)}'
+    )
+
+# Учитывает ограничение процессоров контейнера через cpuset.
+cpu_count = len(os.sched_getaffinity(0))
+default_workers = {
+    'sync': cpu_count * 2 + 1,
+    'threaded': cpu_count + 1,
+    'asgi': cpu_count,
+}[server_mode]
+if os.getenv('CACHE_BACKEND', 'mmap') == 'locmem':
+    default_workers = 1
+
+wsgi_app, worker_class = SERVER_MODES[server_mode]
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Перезапуск процессов ограничивает рост памяти, а разброс не даёт
+# всем процессам перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
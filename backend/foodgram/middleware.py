@@ -0,0 +1,156 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .compression import choose_encoding, get_compressor
+from .db_routers import read_from_replica
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_PIN_COOKIE = 'primary_pin'
+PRIMARY_PIN_SALT = 'foodgram.middleware.primary_pin'
+
+
+def is_pinned(request):
+    """Была ли у клиента запись за последние DB_PRIMARY_PIN_SECONDS."""
+    return request.get_signed_cookie(
+        PRIMARY_PIN_COOKIE, default=None, salt=PRIMARY_PIN_SALT,
+        max_age=settings.DB_PRIMARY_PIN_SECONDS,
+    ) is not None
+
+
+def pin_to_primary(request, response):
+    if request.method not in SAFE_METHODS:
+        response.set_signed_cookie(
+            PRIMARY_PIN_COOKIE, '1', salt=PRIMARY_PIN_SALT,
+            max_age=settings.DB_PRIMARY_PIN_SECONDS,
+            httponly=True, samesite='Lax',
+        )
+    return response
+
+
+class ReplicaRoutingMiddleware:
+    """Отправляет чтение безопасных запросов на реплику.
+
+    После записи клиент на DB_PRIMARY_PIN_SECONDS секунд закрепляется
+    за основной базой, чтобы сразу видеть свои изменения. Закрепление
+    хранится в подписанной cookie с меткой времени, поэтому его видит
+    любой воркер, принявший следующий запрос.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_from_replica.set(
+            request.method in SAFE_METHODS and not is_pinned(request)
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = read_from_replica.set(
+            request.method in SAFE_METHODS and not is_pinned(request)
+        )
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return pin_to_primary(request, response)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы brotli или gzip по заголовку Accept-Encoding.
+
+    Сжимаются ответы с типом из COMPRESSION_CONTENT_TYPES: обычные — если
+    тело не короче COMPRESSION_MIN_SIZE, потоковые — по частям, без
+    буферизации всего ответа. Ответы с Content-Encoding, с Cache-Control:
+    no-transform и отмеченные compress_exempt не изменяются.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(
+            request, await self.get_response(request)
+        )
+
+    def is_compressible(self, response):
+        content_type = response.get('Content-Type', '').partition(';')[0]
+        return (
+            not getattr(response, 'compress_exempt', False)
+            and not response.has_header('Content-Encoding')
+            and 'no-transform' not in response.get('Cache-Control', '')
+            and content_type.strip() in settings.COMPRESSION_CONTENT_TYPES
+            and (
+                response.streaming
+                or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+            )
+        )
+
+    def process_response(self, request, response):
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                response, get_compressor(encoding)
+            )
+            del response.headers['Content-Length']
+        else:
+            compressor = get_compressor(encoding)
+            content = (
+                compressor.process(response.content) + compressor.finish()
+            )
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, response, compressor):
+        """Сжимает поток, отдавая каждую часть сразу после её получения."""
+        chunks = response.streaming_content
+        if response.is_async:
+            async def compress_async():
+                async for chunk in chunks:
+                    yield compressor.process(chunk) + compressor.flush()
+                yield compressor.finish()
+
+            return compress_async()
+
+        def compress_sync():
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+
+        return compress_sync()
@@ -0,0 +1,365 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FGCACHE1'
+FILE_HEADER = struct.Struct('<8sIII')
+FILE_HEADER_SIZE = 64
+SET_HEADER = struct.Struct('<I')
+SET_HEADER_SIZE = 8
+# Хеш ключа, срок действия (0 — бессрочно), длины ключа и значения, флаги.
+SLOT_HEADER = struct.Struct('<16sdHIB')
+FLAGS_OFFSET = SLOT_HEADER.size - 1
+FLAG_USED = 1
+FLAG_REFERENCED = 2
+WAYS = 8
+THREAD_LOCK_STRIPES = 64
+# Сколько ключей со слишком большими значениями процесс запоминает,
+# чтобы предупреждать о каждом только один раз.
+OVERSIZED_KEYS_LIMIT = 1000
+
+_regions = {}
+_regions_lock = threading.Lock()
+_oversized_keys = set()
+
+
+class SharedRegion:
+    """Файл, отображённый в память, с наборами слотов фиксированного размера.
+
+    Ключ попадает в один набор из WAYS слотов по своему хешу. Набор
+    блокируется диапазонной блокировкой fcntl между процессами и
+    блокировкой потока внутри процесса. Если свободных слотов нет,
+    вытесняется запись по алгоритму clock: чтение ставит слоту флаг
+    обращения, стрелка набора снимает флаги и вытесняет первый слот без
+    флага.
+    """
+
+    def __init__(self, path, sets, slot_size):
+        self.sets = sets
+        self.slot_size = slot_size
+        self.set_size = SET_HEADER_SIZE + WAYS * slot_size
+        size = FILE_HEADER_SIZE + sets * self.set_size
+        header = FILE_HEADER.pack(MAGIC, sets, WAYS, slot_size)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, FILE_HEADER_SIZE)
+        try:
+            if (
+                os.fstat(self.fd).st_size != size
+                or os.pread(self.fd, FILE_HEADER.size, 0) != header
+            ):
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, header, 0)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, FILE_HEADER_SIZE)
+        self.map = mmap.mmap(self.fd, size)
+        self.thread_locks = [
+            threading.Lock() for _ in range(THREAD_LOCK_STRIPES)
+        ]
+
+    def locate(self, key):
+        key_bytes = key.encode()
+        digest = hashlib.blake2b(key_bytes, digest_size=16).digest()
+        set_index = int.from_bytes(digest[:8], 'little') % self.sets
+        return set_index, digest, key_bytes
+
+    @contextmanager
+    def locked(self, set_index, exclusive):
+        start = FILE_HEADER_SIZE + set_index * self.set_size
+        with self.thread_locks[set_index % THREAD_LOCK_STRIPES]:
+            fcntl.lockf(
+                self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH,
+                self.set_size, start,
+            )
+            try:
+                yield start
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, self.set_size, start)
+
+    def slot_offset(self, base, way):
+        return base + SET_HEADER_SIZE + way * self.slot_size
+
+    def find(self, base, digest, key_bytes, now):
+        """Номер слота с живой записью ключа и её заголовок."""
+        for way in range(WAYS):
+            offset = self.slot_offset(base, way)
+            header = SLOT_HEADER.unpack_from(self.map, offset)
+            slot_digest, expires, key_length, _, flags = header
+            if not flags & FLAG_USED or slot_digest != digest:
+                continue
+            start = offset + SLOT_HEADER.size
+            if self.map[start:start + key_length] != key_bytes:
+                continue
+            if expires and expires <= now:
+                return None, None
+            return way, header
+        return None, None
+
+    def read_value(self, base, way, header):
+        _, _, key_length, value_length, _ = header
+        start = self.slot_offset(base, way) + SLOT_HEADER.size + key_length
+        return self.map[start:start + value_length]
+
+    def victim(self, base, now):
+        for way in range(WAYS):
+            _, expires, _, _, flags = SLOT_HEADER.unpack_from(
+                self.map, self.slot_offset(base, way)
+            )
+            if not flags & FLAG_USED or (expires and expires <= now):
+                return way
+        (hand,) = SET_HEADER.unpack_from(self.map, base)
+        while True:
+            flags_offset = self.slot_offset(base, hand) + FLAGS_OFFSET
+            flags = self.map[flags_offset]
+            if not flags & FLAG_REFERENCED:
+                SET_HEADER.pack_into(self.map, base, (hand + 1) % WAYS)
+                return hand
+            self.map[flags_offset] = flags & ~FLAG_REFERENCED
+            hand = (hand + 1) % WAYS
+
+    def write_slot(self, base, way, digest, key_bytes, data, expires):
+        offset = self.slot_offset(base, way)
+        start = offset + SLOT_HEADER.size
+        # Слот помечается свободным на время записи: если процесс упадёт
+        # посередине, недописанное значение не будет прочитано.
+        self.map[offset + FLAGS_OFFSET] = 0
+        self.map[start:start + len(key_bytes) + len(data)] = key_bytes + data
+        SLOT_HEADER.pack_into(
+            self.map, offset, digest, expires or 0, len(key_bytes),
+            len(data), FLAG_USED,
+        )
+
+    def fits(self, key_bytes, data):
+        return SLOT_HEADER.size + len(key_bytes) + len(data) <= self.slot_size
+
+    def get(self, key):
+        set_index, digest, key_bytes = self.locate(key)
+        with self.locked(set_index, exclusive=False) as base:
+            way, header = self.find(base, digest, key_bytes, time.time())
+            if way is None:
+                return None
+            flags_offset = self.slot_offset(base, way) + FLAGS_OFFSET
+            self.map[flags_offset] = FLAG_USED | FLAG_REFERENCED
+            return self.read_value(base, way, header)
+
+    def set(self, key, data, expires, only_new=False):
+        set_index, digest, key_bytes = self.locate(key)
+        if not self.fits(key_bytes, data):
+            # Старое значение не должно пережить неудачную запись.
+            self.delete(key)
+            return False
+        with self.locked(set_index, exclusive=True) as base:
+            now = time.time()
+            way, _ = self.find(base, digest, key_bytes, now)
+            if way is not None and only_new:
+                return False
+            if way is None:
+                way = self.find_dead(base, digest, key_bytes)
+            if way is None:
+                way = self.victim(base, now)
+            self.write_slot(base, way, digest, key_bytes, data, expires)
+            return True
+
+    def find_dead(self, base, digest, key_bytes):
+        """Слот с записью ключа, в том числе истёкшей."""
+        for way in range(WAYS):
+            offset = self.slot_offset(base, way)
+            slot_digest, _, key_length, _, flags = SLOT_HEADER.unpack_from(
+                self.map, offset
+            )
+            start = offset + SLOT_HEADER.size
+            if (
+                flags & FLAG_USED and slot_digest == digest
+                and self.map[start:start + key_length] == key_bytes
+            ):
+                return way
+        return None
+
+    def update(self, key, function):
+        """Атомарно заменяет значение на function(значение).
+
+        Возвращает None, если ключа нет, иначе новое значение.
+        """
+        set_index, digest, key_bytes = self.locate(key)
+        with self.locked(set_index, exclusive=True) as base:
+            way, header = self.find(base, digest, key_bytes, time.time())
+            if way is None:
+                return None
+            value, data = function(self.read_value(base, way, header))
+            if not self.fits(key_bytes, data):
+                raise ValueError(f'Значение ключа {key} не помещается в слот')
+            self.write_slot(base, way, digest, key_bytes, data, header[1])
+            return value
+
+    def touch(self, key, expires):
+        set_index, digest, key_bytes = self.locate(key)
+        with self.locked(set_index, exclusive=True) as base:
+            way, _ = self.find(base, digest, key_bytes, time.time())
+            if way is None:
+                return False
+            struct.pack_into(
+                '<d', self.map, self.slot_offset(base, way) + 16,
+                expires or 0,
+            )
+            return True
+
+    def delete(self, key):
+        set_index, digest, key_bytes = self.locate(key)
+        with self.locked(set_index, exclusive=True) as base:
+            way = self.find_dead(base, digest, key_bytes)
+            if way is None:
+                return False
+            self.map[self.slot_offset(base, way) + FLAGS_OFFSET] = 0
+            return True
+
+    def clear(self):
+        for set_index in range(self.sets):
+            with self.locked(set_index, exclusive=True) as base:
+                for way in range(WAYS):
+                    self.map[self.slot_offset(base, way) + FLAGS_OFFSET] = 0
+
+
+def get_region(path, sets, slot_size):
+    """Область процесса: отображение открывается заново после fork."""
+    region_key = (path, sets, slot_size, os.getpid())
+    region = _regions.get(region_key)
+    if region is None:
+        with _regions_lock:
+            region = _regions.get(region_key)
+            if region is None:
+                region = _regions[region_key] = SharedRegion(
+                    path, sets, slot_size
+                )
+    return region
+
+
+class MmapCache(BaseCache):
+    """Кеш в общем файле, отображённом в память, для процессов одного хоста.
+
+    LOCATION — каталог файла кеша. В OPTIONS задаются SLOTS — число
+    слотов и SLOT_SIZE — размер слота в байтах. Значения, которые вместе
+    с ключом и заголовком не помещаются в слот, не кешируются, о чём
+    один раз на ключ пишется предупреждение. Файл разреженный: память
+    занимают только страницы, в которые записаны значения, поэтому
+    запас в размере слота почти ничего не стоит. Файл называется по
+    геометрии кеша, поэтому смена настроек не затрагивает файл,
+    открытый работающими процессами.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.sets = max(options.get('SLOTS', 8192) // WAYS, 1)
+        self.slot_size = options.get('SLOT_SIZE', 32768)
+        self.path = os.path.join(
+            location, f'cache-{self.sets}x{WAYS}x{self.slot_size}.mmap'
+        )
+        os.makedirs(location, exist_ok=True)
+
+    @property
+    def region(self):
+        return get_region(self.path, self.sets, self.slot_size)
+
+    def get_expires(self, timeout):
+        return self.get_backend_timeout(timeout) or 0
+
+    def encode(self, key, value):
+        """Сериализует значение и предупреждает, если оно не поместится.
+
+        Такое значение не кешируется, и каждый запрос к ключу будет
+        промахом, поэтому размер слота нужно подбирать по значениям.
+        """
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if (
+            not self.region.fits(key.encode(), data)
+            and key not in _oversized_keys
+            and len(_oversized_keys) < OVERSIZED_KEYS_LIMIT
+        ):
+            _oversized_keys.add(key)
+            logger.warning(
+                'Значение ключа %s (%d байт) не помещается в слот '
+                '%d байт и не кешируется',
+                key, len(data), self.slot_size,
+            )
+        return data
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data = self.region.get(key)
+        if data is None:
+            return default
+        return pickle.loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.region.set(
+            key, self.encode(key, value), self.get_expires(timeout)
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.region.set(
+            key, self.encode(key, value), self.get_expires(timeout),
+            only_new=True,
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.region.touch(key, self.get_expires(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.region.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.region.get(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        def increment(data):
+            value = pickle.loads(data) + delta
+            return value, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        value = self.region.update(key, increment)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        self.region.clear()
+
+    # Операции занимают микросекунды и не ждут сети, поэтому асинхронные
+    # варианты выполняются в цикле событий без перехода в поток.
+    async def aget(self, key, default=None, version=None):
+        return self.get(key, default, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.set(key, value, timeout, version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.add(key, value, timeout, version)
+
+    async def atouch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.touch(key, timeout, version)
+
+    async def adelete(self, key, version=None):
+        return self.delete(key, version)
+
+    async def ahas_key(self, key, version=None):
+        return self.has_key(key, version)
+
+    async def aincr(self, key, delta=1, version=None):
+        return self.incr(key, delta, version)
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
+    'foodgram.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -65,6 +68,8 @@ SQLITE3 = {
     }
 }
 
+SERVER_MODE = os.getenv('SERVER_MODE', 'sync')
+
 POSTGRESQL = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -73,11 +78,36 @@ POSTGRESQL = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "postgres"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", 5432),
+        # Под ASGI соединения не переиспользуются между запросами,
+        # поэтому постоянные соединения там выключены по умолчанию.
+        "CONN_MAX_AGE": int(os.getenv(
+            "DB_CONN_MAX_AGE", 0 if SERVER_MODE == 'asgi' else 60
+        )),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
 DATABASES = SQLITE3 if DEBUG else POSTGRESQL
 
+if DEBUG and os.getenv('SQLITE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('SQLITE_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif not DEBUG and os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('POSTGRES_REPLICA_DB', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.db_routers.PrimaryReplicaRouter']
+
+DB_PRIMARY_PIN_SECONDS = int(os.getenv('DB_PRIMARY_PIN_SECONDS', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,12 +147,51 @@ AUTH_USER_MODEL = 'recipes.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.paginations.PageSizeLimitPagination',
     'PAGE_SIZE': 6,
 }
 
+# Наибольший limit постраничных списков, если у представления не задан
+# свой max_page_size.
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+
+# Общий для процессов хоста кеш в файле, отображённом в память. Кеш в
+# памяти каждого процесса (CACHE_BACKEND=locmem) годится только для
+# одного процесса: инвалидация в нём не доходит до остальных воркеров.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'mmap')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    } if CACHE_BACKEND == 'locmem' else {
+        'BACKEND': 'foodgram.mmap_cache.MmapCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache'),
+        'OPTIONS': {
+            'SLOTS': int(os.getenv('CACHE_SLOTS', 8192)),
+            # Самые большие горячие значения — списки ингредиентов по
+            # первой букве названия, до 16 КБ.
+            'SLOT_SIZE': int(os.getenv('CACHE_SLOT_SIZE', 32768)),
+        },
+    },
+}
+
+# Сжатие ответов API и списка покупок: типы содержимого, минимальный
+# размер тела в байтах, уровни gzip (1–9) и brotli (0–11).
+COMPRESSION_CONTENT_TYPES = ('application/json', 'text/plain')
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+
+# Каталог файлов готового снимка справочника ингредиентов.
+INGREDIENT_CATALOG_DIR = os.getenv(
+    'INGREDIENT_CATALOG_DIR', '/tmp/foodgram_catalog'
+)
+
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', 'default')
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv('TOKEN_CACHE_MAX_SIZE', 10000))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
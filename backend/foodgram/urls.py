@@ -3,14 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from foodgram.views import redirect_short_link
+from foodgram.views import aredirect_short_link, redirect_short_link
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path(
         's/<str:encoded_id>/',
-        redirect_short_link,
+        aredirect_short_link if settings.SERVER_MODE == 'asgi'
+        else redirect_short_link,
         name='redirect_short_link'
     ),
 ]
@@ -1,4 +1,4 @@
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
@@ -13,3 +13,14 @@ def redirect_short_link(request, encoded_id):
         return HttpResponseRedirect(f'/recipes/{recipe_id}/')
     except (ValueError, TypeError):
         return HttpResponse(status=404)
+
+
+async def aredirect_short_link(request, encoded_id):
+    """Асинхронный вариант redirect_short_link для запуска под ASGI."""
+    try:
+        recipe_id = int(force_str(urlsafe_base64_decode(encoded_id)))
+    except (ValueError, TypeError):
+        return HttpResponse(status=404)
+    if not await Recipe.objects.filter(id=recipe_id).aexists():
+        raise Http404
+    return HttpResponseRedirect(f'/recipes/{recipe_id}/')
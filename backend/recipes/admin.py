@@ -1,24 +1,69 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.html import format_html
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
 
+from .duplicates import find_duplicates
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Subscribe, Tag, User)
 
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой количества строк для больших таблиц.
+
+    Для списка без фильтров в PostgreSQL берёт оценку из pg_class
+    вместо полного COUNT(*). Небольшие таблицы, другие СУБД и
+    отфильтрованные списки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Базовые настройки списков для больших таблиц."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
-    list_display = ('id', 'username', 'email')
+class UserAdmin(BaseUserAdmin, LargeTableAdmin):
+    list_display = (
+        'id', 'username', 'email', 'recipes_count', 'subscribers_count'
+    )
+    readonly_fields = ('recipes_count', 'subscribers_count')
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ('Статистика', {'fields': ('recipes_count', 'subscribers_count')}),
+    )
     search_fields = ('username', 'email')
-    list_filter = ('username', 'email', 'first_name', 'last_name')
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
     list_display_links = ('username',)
 
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'author')
+    list_select_related = ('user', 'author')
     search_fields = ('user__username', 'author__username')
-    list_filter = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
 
 
 @admin.register(Tag)
@@ -32,40 +77,68 @@ class TagAdmin(admin.ModelAdmin):
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'measurement_unit')
     search_fields = ('name',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     list_display_links = ('name',)
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
+    autocomplete_fields = ('ingredient',)
+    extra = 1
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'favorites_count', 'get_image')
+class RecipeAdmin(LargeTableAdmin):
+    list_display = (
+        'id', 'name', 'author', 'favorites_count', 'carts_count', 'get_image'
+    )
+    readonly_fields = ('favorites_count', 'carts_count', 'get_duplicates')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username', 'author__email')
-    list_filter = ('name', 'author', 'tags')
+    list_filter = ('tags',)
     list_display_links = ('name',)
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInline,)
 
-    @admin.display(description='Добавления в избранное')
-    def favorites_count(self, obj):
-        return obj.favorites.count()
-
     @admin.display(description='Изображение')
     def get_image(self, obj):
         if obj.image:
             return format_html('<img src="{}" width="50" />', obj.image.url)
         return 'Нет изображения'
 
+    @admin.display(description='Возможные дубликаты')
+    def get_duplicates(self, obj):
+        if obj.pk is None:
+            return '—'
+        duplicates = find_duplicates(
+            obj.name,
+            obj.recipe_ingredients.values_list('ingredient_id', flat=True),
+            exclude_id=obj.pk,
+        )
+        return format_html_join(
+            ', ', '<a href="{}">{}</a> ({})',
+            (
+                (
+                    reverse('admin:recipes_recipe_change', args=(recipe.pk,)),
+                    recipe.name,
+                    f'{recipe.similarity:.0%}',
+                )
+                for recipe in duplicates
+            ),
+        ) or 'Не найдены'
+
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
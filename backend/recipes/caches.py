@@ -0,0 +1,200 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from foodgram.db_routers import use_primary
+
+from .models import Ingredient, Tag
+
+# Кеши заполняются чтением с основной базы (use_primary): значение с
+# отстающей реплики, сохранённое сразу после сброса, жило бы весь срок.
+#
+# Множества сбрасываются при каждом изменении, поэтому процессы должны
+# работать с общим кешем: с CACHE_BACKEND=locmem остальные процессы
+# видели бы старое множество до истечения срока.
+USER_RECIPE_IDS_KEY = 'recipes:{model}:{user_id}'
+USER_RECIPE_IDS_TIMEOUT = 60 * 60
+# Большие множества не помещались бы в слот кеша, а каждый запрос читал
+# бы их из базы целиком.
+USER_RECIPE_IDS_MAX_SIZE = 1000
+USER_RECIPE_IDS_OVERFLOW = 'overflow'
+
+
+def get_user_recipe_ids_key(model, user_id):
+    return USER_RECIPE_IDS_KEY.format(
+        model=model._meta.model_name, user_id=user_id
+    )
+
+
+def get_user_recipe_ids(model, user_id):
+    """Множество id рецептов пользователя в избранном или корзине.
+
+    Множество больше USER_RECIPE_IDS_MAX_SIZE не кешируется: вместо него
+    сохраняется метка и возвращается None, а вызывающий проверяет
+    рецепты соединением с таблицей связи.
+    """
+    key = get_user_recipe_ids_key(model, user_id)
+    recipe_ids = cache.get(key)
+    if recipe_ids is None:
+        with use_primary():
+            recipe_ids = list(
+                model.objects.filter(user_id=user_id)
+                .values_list('recipe_id', flat=True)
+                [:USER_RECIPE_IDS_MAX_SIZE + 1]
+            )
+        recipe_ids = limit_user_recipe_ids(recipe_ids)
+        cache.set(key, recipe_ids, USER_RECIPE_IDS_TIMEOUT)
+    return None if recipe_ids == USER_RECIPE_IDS_OVERFLOW else recipe_ids
+
+
+async def aget_user_recipe_ids(model, user_id):
+    """Асинхронный вариант get_user_recipe_ids."""
+    key = get_user_recipe_ids_key(model, user_id)
+    recipe_ids = await cache.aget(key)
+    if recipe_ids is None:
+        with use_primary():
+            recipe_ids = [
+                recipe_id async for recipe_id in
+                model.objects.filter(user_id=user_id)
+                .values_list('recipe_id', flat=True)
+                [:USER_RECIPE_IDS_MAX_SIZE + 1]
+            ]
+        recipe_ids = limit_user_recipe_ids(recipe_ids)
+        await cache.aset(key, recipe_ids, USER_RECIPE_IDS_TIMEOUT)
+    return None if recipe_ids == USER_RECIPE_IDS_OVERFLOW else recipe_ids
+
+
+def limit_user_recipe_ids(recipe_ids):
+    if len(recipe_ids) > USER_RECIPE_IDS_MAX_SIZE:
+        return USER_RECIPE_IDS_OVERFLOW
+    return frozenset(recipe_ids)
+
+
+def clear_user_recipe_ids(model, user_id):
+    """Сбрасывает множество после добавления или удаления рецепта.
+
+    Множество не правится на месте: чтение и запись в кеш не атомарны,
+    и одно из двух одновременных изменений потерялось бы.
+    """
+    cache.delete(get_user_recipe_ids_key(model, user_id))
+
+
+TAG_IDS_KEY = 'recipes:tag_ids'
+TAG_IDS_TIMEOUT = 60 * 10
+
+
+def get_tag_ids(slugs=()):
+    """Словарь slug -> id всех тегов.
+
+    Если какого-то из slugs нет в закешированном словаре, словарь
+    перечитывается из базы: тег мог появиться уже после кеширования.
+    """
+    tag_ids = cache.get(TAG_IDS_KEY)
+    if tag_ids is None or not tag_ids.keys() >= set(slugs):
+        with use_primary():
+            tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_IDS_KEY, tag_ids, TAG_IDS_TIMEOUT)
+    return tag_ids
+
+
+async def aget_tag_ids(slugs=()):
+    """Асинхронный вариант get_tag_ids."""
+    tag_ids = await cache.aget(TAG_IDS_KEY)
+    if tag_ids is None or not tag_ids.keys() >= set(slugs):
+        with use_primary():
+            tag_ids = {
+                slug: tag_id async for slug, tag_id in
+                Tag.objects.values_list('slug', 'id')
+            }
+        await cache.aset(TAG_IDS_KEY, tag_ids, TAG_IDS_TIMEOUT)
+    return tag_ids
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
+
+def clear_tag_ids():
+    cache.delete(TAG_IDS_KEY)
+
+
+# Горячие списки API: кешируются через stale_cache.get_or_refresh.
+TAG_LIST_KEY = 'api:tags'
+TAG_LIST_SOFT_TIMEOUT = 60 * 10
+TAG_LIST_HARD_TIMEOUT = 60 * 60 * 24
+INGREDIENT_LIST_KEY = 'api:ingredients:{version}:{digest}'
+INGREDIENT_LIST_VERSION_KEY = 'api:ingredients:version'
+# Срок ограничен: версия, вычисленная по данным до изменения и записанная
+# уже после сброса, заменится новой.
+INGREDIENT_LIST_VERSION_TIMEOUT = 60 * 10
+INGREDIENT_LIST_SOFT_TIMEOUT = 60 * 10
+INGREDIENT_LIST_HARD_TIMEOUT = 60 * 60 * 24
+RECIPE_FIRST_PAGE_KEY = 'api:recipes:first_page'
+RECIPE_FIRST_PAGE_SOFT_TIMEOUT = 60
+RECIPE_FIRST_PAGE_HARD_TIMEOUT = 60 * 10
+
+
+def compute_ingredient_list_version():
+    """Версия справочника ингредиентов — дайджест его содержимого.
+
+    Процессы с разными кешами получают одну версию для одних данных
+    и одинаково называют файлы снимка в api.catalog.
+    """
+    digest = hashlib.sha256()
+    with use_primary():
+        for row in Ingredient.objects.order_by('id').values_list(
+            'id', 'name', 'measurement_unit'
+        ).iterator():
+            digest.update(repr(row).encode())
+    return digest.hexdigest()[:16]
+
+
+def get_ingredient_list_version():
+    version = cache.get(INGREDIENT_LIST_VERSION_KEY)
+    if version is None:
+        version = compute_ingredient_list_version()
+        cache.set(
+            INGREDIENT_LIST_VERSION_KEY, version,
+            INGREDIENT_LIST_VERSION_TIMEOUT,
+        )
+    return version
+
+
+def get_ingredient_list_key(name):
+    """Ключ списка ингредиентов по фильтру имени и версии справочника."""
+    return INGREDIENT_LIST_KEY.format(
+        version=get_ingredient_list_version(),
+        digest=hashlib.sha256(name.encode()).hexdigest(),
+    )
+
+
+async def aget_ingredient_list_version():
+    """Асинхронный вариант get_ingredient_list_version."""
+    version = await cache.aget(INGREDIENT_LIST_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(compute_ingredient_list_version)()
+        await cache.aset(
+            INGREDIENT_LIST_VERSION_KEY, version,
+            INGREDIENT_LIST_VERSION_TIMEOUT,
+        )
+    return version
+
+
+async def aget_ingredient_list_key(name):
+    """Асинхронный вариант get_ingredient_list_key."""
+    return INGREDIENT_LIST_KEY.format(
+        version=await aget_ingredient_list_version(),
+        digest=hashlib.sha256(name.encode()).hexdigest(),
+    )
+
+
+def clear_tag_list():
+    cache.delete(TAG_LIST_KEY)
+
+
+def clear_ingredient_lists():
+    cache.delete(INGREDIENT_LIST_VERSION_KEY)
+
+
+def clear_recipe_first_page():
+    cache.delete(RECIPE_FIRST_PAGE_KEY)
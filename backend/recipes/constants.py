@@ -8,3 +8,12 @@ INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH = 64
 TIME_MIN_VALUE = 1
 TIME_MAX_VALUE = 480
 MIN_VALUE = 1
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+FEED_FANOUT_RESUME_SUBSCRIBERS = 800
+PANTRY_MAX_INGREDIENTS = 100
+SIMILAR_RECIPES_COUNT = 10
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+DUPLICATE_THRESHOLD = 0.7
+COOKING_TIME_FACET_EDGES = (TIME_MIN_VALUE, 15, 30, 60, 120, TIME_MAX_VALUE)
+FACET_AUTHORS_LIMIT = 10
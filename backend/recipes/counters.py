@@ -0,0 +1,39 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart, Subscribe, User
+
+# Модель со счётчиком, поле счётчика, считаемая модель, её внешний ключ.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+
+
+def update_counters(sender, instance, delta):
+    """Изменяет счётчики, зависящие от созданного или удалённого объекта."""
+    for model, field, source, foreign_key in COUNTERS:
+        if source is not sender:
+            continue
+        queryset = model.objects.filter(
+            pk=getattr(instance, f'{foreign_key}_id')
+        )
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(source, foreign_key):
+    """Подзапрос с актуальным значением счётчика для строки модели."""
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{foreign_key: OuterRef('pk')})
+            .order_by()
+            .values(foreign_key)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
@@ -0,0 +1,92 @@
+import base64
+import datetime
+import json
+import os
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+# Каждая модель выгружается в файл <app>.<model>.ndjson: строка — объект
+# {attname: значение}, строки упорядочены по первичному ключу.
+# manifest.json перечисляет модели и число строк в каждой.
+MANIFEST_FILE = 'manifest.json'
+DUMP_FORMAT = 1
+
+
+def get_dump_models():
+    """Модели recipes, включая промежуточные таблицы M2M.
+
+    Таблицы со ссылками за пределы приложения (группы и права
+    пользователей) не выгружаются.
+    """
+    app_models = list(
+        apps.get_app_config('recipes').get_models(include_auto_created=True)
+    )
+    return [
+        model for model in app_models
+        if get_dependencies(model) <= set(app_models)
+    ]
+
+
+def get_dependencies(model):
+    return {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is not model
+    }
+
+
+def get_restore_levels(dump_models):
+    """Модели по уровням зависимостей.
+
+    Модели одного уровня ссылаются только на модели предыдущих
+    уровней, поэтому их можно загружать одновременно.
+    """
+    remaining = set(dump_models)
+    levels = []
+    while remaining:
+        level = [
+            model for model in dump_models
+            if model in remaining and not get_dependencies(model) & remaining
+        ]
+        if not level:
+            raise ValueError(
+                'Циклические ссылки между моделями: '
+                + ', '.join(model._meta.label for model in remaining)
+            )
+        levels.append(level)
+        remaining.difference_update(level)
+    return levels
+
+
+def get_dump_path(path, model):
+    return os.path.join(path, f'{model._meta.label_lower}.ndjson')
+
+
+def encode_row(fields, values):
+    row = {}
+    for field, value in zip(fields, values):
+        if isinstance(field, models.BinaryField) and value is not None:
+            value = base64.b64encode(bytes(value)).decode()
+        elif isinstance(value, (datetime.datetime, datetime.time)):
+            # DjangoJSONEncoder отбрасывает микросекунды.
+            value = value.isoformat()
+        row[field.attname] = value
+    return json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+
+def decode_row(fields, line):
+    """Аргументы конструктора модели из строки выгрузки."""
+    row = json.loads(line)
+    return {
+        field.attname: field.to_python(row[field.attname])
+        for field in fields
+    }
+
+
+def format_throughput(rows, size, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    return (
+        f'{size / 1e6:.1f} МБ за {elapsed:.1f} с '
+        f'({rows / elapsed:.0f} строк/с, {size / 1e6 / elapsed:.1f} МБ/с)'
+    )
@@ -0,0 +1,189 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .constants import DUPLICATE_THRESHOLD, MINHASH_BANDS, MINHASH_PERMUTATIONS
+from .models import Recipe, RecipeBucket, RecipeIngredient, RecipeSignature
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+BAND_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+CLUSTER_PAIRWISE_MAX_SIZE = 100
+WORD_RE = re.compile(r'\w+')
+
+# Перестановки фиксированы, чтобы сигнатуры из разных процессов
+# и запусков были сравнимы между собой.
+_random = np.random.RandomState(1)
+PERMUTATION_A = _random.randint(
+    1, 1 << 31, MINHASH_PERMUTATIONS, dtype=np.uint64
+)
+PERMUTATION_B = _random.randint(
+    0, 1 << 32, MINHASH_PERMUTATIONS, dtype=np.uint64
+)
+
+
+def recipe_tokens(name, ingredient_ids):
+    """Множество признаков рецепта: слова названия и ингредиенты."""
+    return {
+        f'w:{word}' for word in WORD_RE.findall(name.lower())
+    } | {
+        f'i:{ingredient_id}' for ingredient_id in ingredient_ids
+    }
+
+
+def minhash(tokens):
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode()) for token in tokens),
+        dtype=np.uint64, count=len(tokens),
+    )
+    if not len(hashes):
+        return np.full(MINHASH_PERMUTATIONS, MAX_HASH, dtype=np.uint32)
+    permuted = (
+        (np.outer(hashes, PERMUTATION_A) + PERMUTATION_B) % MERSENNE_PRIME
+    ) & MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature):
+    """Ключи LSH-корзин: по одному на каждую полосу сигнатуры."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                bytes([band])
+                + signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]
+                .tobytes(),
+                digest_size=8,
+            ).digest(),
+            'big', signed=True,
+        )
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def load_signature(data):
+    return np.frombuffer(bytes(data), dtype=np.uint32)
+
+
+def find_duplicates(name, ingredient_ids, exclude_id=None,
+                    threshold=DUPLICATE_THRESHOLD):
+    """Рецепты, похожие на данный, с оценкой сходства Жаккара.
+
+    Кандидаты берутся только из общих LSH-корзин, поэтому проверка
+    не зависит от размера таблицы рецептов.
+    """
+    signature = minhash(recipe_tokens(name, ingredient_ids))
+    candidates = RecipeSignature.objects.filter(
+        recipe_id__in=RecipeBucket.objects.filter(
+            key__in=band_keys(signature)
+        ).values('recipe_id')
+    ).exclude(recipe_id=exclude_id).values_list('recipe_id', 'minhash')
+    scores = {
+        recipe_id: float(np.mean(load_signature(data) == signature))
+        for recipe_id, data in candidates
+    }
+    recipes = Recipe.objects.in_bulk([
+        recipe_id for recipe_id, score in scores.items()
+        if score >= threshold
+    ])
+    for recipe_id, recipe in recipes.items():
+        recipe.similarity = scores[recipe_id]
+    return sorted(
+        recipes.values(), key=lambda recipe: recipe.similarity, reverse=True
+    )
+
+
+def index_recipes(recipe_ids):
+    """Пересчитывает сигнатуры и LSH-корзины рецептов."""
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].append(ingredient_id)
+    signatures, buckets = [], []
+    for recipe_id, name in Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', 'name'):
+        signature = minhash(recipe_tokens(name, ingredients[recipe_id]))
+        signatures.append(RecipeSignature(
+            recipe_id=recipe_id, minhash=signature.tobytes()
+        ))
+        buckets.extend(
+            RecipeBucket(recipe_id=recipe_id, key=key)
+            for key in band_keys(signature)
+        )
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(signatures)
+        RecipeBucket.objects.bulk_create(buckets)
+    return len(signatures)
+
+
+def duplicate_clusters(threshold=DUPLICATE_THRESHOLD, chunk_size=5000):
+    """Группы дубликатов по всей таблице за один проход по корзинам.
+
+    Читаются только корзины, в которые попало больше одного рецепта.
+    Внутри корзины рецепты сравниваются попарно, а в очень больших
+    корзинах — только с первым рецептом, и объединяются в кластеры
+    системой непересекающихся множеств.
+    """
+    colliding = (
+        RecipeBucket.objects.values('key')
+        .annotate(size=Count('id')).filter(size__gt=1).values('key')
+    )
+    groups = defaultdict(list)
+    for key, recipe_id in (
+        RecipeBucket.objects.filter(key__in=colliding)
+        .values_list('key', 'recipe_id').iterator()
+    ):
+        groups[key].append(recipe_id)
+
+    recipe_ids = sorted({
+        recipe_id for group in groups.values() for recipe_id in group
+    })
+    signatures = {}
+    for start in range(0, len(recipe_ids), chunk_size):
+        signatures.update(
+            (recipe_id, load_signature(data))
+            for recipe_id, data in RecipeSignature.objects.filter(
+                recipe_id__in=recipe_ids[start:start + chunk_size]
+            ).values_list('recipe_id', 'minhash')
+        )
+
+    parents = {}
+
+    def find(recipe_id):
+        parents.setdefault(recipe_id, recipe_id)
+        while parents[recipe_id] != recipe_id:
+            parents[recipe_id] = parents[parents[recipe_id]]
+            recipe_id = parents[recipe_id]
+        return recipe_id
+
+    for group in groups.values():
+        group = [
+            recipe_id for recipe_id in group if recipe_id in signatures
+        ]
+        if len(group) < 2:
+            continue
+        matrix = np.stack([signatures[recipe_id] for recipe_id in group])
+        if len(group) <= CLUSTER_PAIRWISE_MAX_SIZE:
+            scores = (matrix[:, None, :] == matrix[None, :, :]).mean(axis=2)
+        else:
+            scores = (matrix[:1] == matrix).mean(axis=1)[None, :]
+        for first, second in zip(*np.nonzero(scores >= threshold)):
+            if first < second:
+                parents[find(group[second])] = find(group[first])
+
+    clusters = defaultdict(list)
+    for recipe_id in parents:
+        clusters[find(recipe_id)].append(recipe_id)
+    return sorted(
+        (sorted(cluster) for cluster in clusters.values()
+         if len(cluster) > 1),
+        key=len, reverse=True,
+    )
@@ -0,0 +1,172 @@
+from django.db import connection, transaction
+
+from .constants import (FEED_FANOUT_MAX_SUBSCRIBERS,
+                        FEED_FANOUT_RESUME_SUBSCRIBERS)
+from .models import FeedBackfill, FeedEntry, Recipe, Subscribe, User
+
+FEED_BATCH_SIZE = 1000
+
+REBUILD_FEEDS_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT subscribe.user_id, recipe.id
+    FROM {subscribe} subscribe
+    JOIN {user} author ON author.id = subscribe.author_id
+    JOIN {recipe} recipe ON recipe.author_id = subscribe.author_id
+    WHERE subscribe.user_id >= %s AND subscribe.user_id < %s
+      AND author.feed_fanout = %s
+'''
+
+BACKFILL_AUTHOR_SQL = '''
+    INSERT INTO {feed} (user_id, recipe_id)
+    SELECT subscribe.user_id, recipe.id
+    FROM {subscribe} subscribe
+    JOIN {recipe} recipe ON recipe.author_id = subscribe.author_id
+    WHERE subscribe.author_id = %s
+    ON CONFLICT DO NOTHING
+'''
+
+
+def is_fanout_author(author_id):
+    return User.objects.filter(pk=author_id, feed_fanout=True).exists()
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if not is_fanout_author(recipe.author_id):
+        return
+    subscriber_ids = Subscribe.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe.id)
+            for user_id in subscriber_ids.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author_to_feed(user_id, author_id):
+    """Заполняет ленту рецептами автора после подписки.
+
+    Автор, у которого подписчиков стало больше
+    FEED_FANOUT_MAX_SUBSCRIBERS, переводится на подмешивание при чтении.
+    """
+    User.objects.filter(
+        pk=author_id,
+        feed_fanout=True,
+        subscribers_count__gt=FEED_FANOUT_MAX_SUBSCRIBERS,
+    ).update(feed_fanout=False)
+    if not is_fanout_author(author_id):
+        return
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id
+    ).values_list('id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in recipe_ids.iterator()
+        ),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    """Убирает рецепты автора из ленты после отписки.
+
+    Вызывается после уменьшения счётчика подписчиков. Автор, у которого
+    подписчиков осталось не больше FEED_FANOUT_RESUME_SUBSCRIBERS,
+    ставится в очередь FeedBackfill: копирование его рецептов в ленты
+    включает команда rebuild_feeds --backfill.
+    """
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+    if User.objects.filter(
+        pk=author_id,
+        feed_fanout=False,
+        subscribers_count__lte=FEED_FANOUT_RESUME_SUBSCRIBERS,
+    ).exists():
+        FeedBackfill.objects.bulk_create(
+            [FeedBackfill(author_id=author_id)], ignore_conflicts=True
+        )
+
+
+def backfill_author_feeds(author_id):
+    """Включает копирование рецептов автора и заполняет ленты.
+
+    Возвращает число добавленных записей или None, если у автора больше
+    FEED_FANOUT_MAX_SUBSCRIBERS подписчиков. Вызывается вне транзакции:
+    режим фиксируется до копирования, поэтому подписки и рецепты,
+    сохранённые позже, копируются сами, а более ранние попадают в
+    выборку. Автор удаляется из очереди только после копирования.
+    """
+    if not User.objects.filter(
+        pk=author_id, subscribers_count__lte=FEED_FANOUT_MAX_SUBSCRIBERS
+    ).update(feed_fanout=True):
+        FeedBackfill.objects.filter(author_id=author_id).delete()
+        return None
+    sql = BACKFILL_AUTHOR_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        subscribe=Subscribe._meta.db_table,
+        recipe=Recipe._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [author_id])
+        created = cursor.rowcount
+    FeedBackfill.objects.filter(author_id=author_id).delete()
+    return created
+
+
+def reset_feed_modes():
+    """Выставляет режим лент авторов по числу подписчиков.
+
+    Нужна перед полной пересборкой лент, например после recount.
+    """
+    User.objects.filter(
+        feed_fanout=True, subscribers_count__gt=FEED_FANOUT_MAX_SUBSCRIBERS
+    ).update(feed_fanout=False)
+    User.objects.filter(
+        feed_fanout=False,
+        subscribers_count__lte=FEED_FANOUT_RESUME_SUBSCRIBERS,
+    ).update(feed_fanout=True)
+    FeedBackfill.objects.filter(author__feed_fanout=True).delete()
+
+
+def get_feed_recipe_ids(user, before=None, limit=10):
+    """Id рецептов ленты по убыванию, строго меньше курсора before.
+
+    Рецепты обычных авторов читаются из ленты пользователя, а рецепты
+    авторов, переведённых на подмешивание при чтении (feed_fanout
+    выключен), выбираются из подписок.
+    """
+    entries = FeedEntry.objects.filter(user=user).order_by('-recipe_id')
+    merged = Recipe.objects.filter(
+        author__subscribing__user=user,
+        author__feed_fanout=False,
+    ).order_by('-id')
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+        merged = merged.filter(id__lt=before)
+    recipe_ids = set(entries.values_list('recipe_id', flat=True)[:limit])
+    recipe_ids.update(merged.values_list('id', flat=True)[:limit])
+    return sorted(recipe_ids, reverse=True)[:limit]
+
+
+def rebuild_feeds(user_from, user_to):
+    """Пересобирает ленты пользователей с id в [user_from, user_to)."""
+    sql = REBUILD_FEEDS_SQL.format(
+        feed=FeedEntry._meta.db_table,
+        subscribe=Subscribe._meta.db_table,
+        user=User._meta.db_table,
+        recipe=Recipe._meta.db_table,
+    )
+    with transaction.atomic():
+        FeedEntry.objects.filter(
+            user_id__gte=user_from, user_id__lt=user_to
+        ).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_from, user_to, True])
+            return cursor.rowcount
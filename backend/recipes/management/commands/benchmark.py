@@ -0,0 +1,270 @@
+import json
+import statistics
+import time
+
+from api.filters import IngredientFilter, RecipeFilter
+from api.serializers import (RecipeCreateUpdateDetailSerializer,
+                             RecipeDetailSerializer,
+                             UserSubscribeRepresentationSerializer)
+from api.views import RecipeViewSet
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from recipes.management.commands.generate_data import generate_recipes
+from recipes.models import Ingredient, Recipe, Tag, User
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+PIXEL_GIF = (
+    'data:image/gif;base64,'
+    'R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw=='
+)
+RECIPE_FILTERS = (
+    'tags=breakfast',
+    'tags=breakfast&tags=lunch&tags=dinner',
+    'author={author_id}',
+    'is_favorited=1',
+    'is_in_shopping_cart=1',
+    'is_favorited=1&tags=lunch',
+)
+INGREDIENT_PREFIXES = ('а', 'мо', 'сах', 'картоф')
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию после замера операции записи."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер сериализаторов, фильтров и агрегаций без HTTP-стека '
+        'с сохранением и сравнением базовых результатов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=0,
+            help='Догенерировать данные до указанного числа рецептов',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help='Генерировать данные без подтверждения',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество повторов каждого замера',
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=6,
+            help='Количество объектов в замерах сериализаторов',
+        )
+        parser.add_argument(
+            '--only', type=str, default='',
+            help='Запустить только замеры, содержащие подстроку',
+        )
+        parser.add_argument(
+            '--save', type=str, default='',
+            help='Сохранить результаты в JSON-файл',
+        )
+        parser.add_argument(
+            '--compare', type=str, default='',
+            help='Сравнить результаты с базовым JSON-файлом',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое относительное замедление при сравнении',
+        )
+
+    def handle(self, *args, **options):
+        generate_recipes(self, options['recipes'], options['interactive'])
+        if not Recipe.objects.exists():
+            raise CommandError(
+                'Нет данных для замеров, используйте --recipes.'
+            )
+
+        self.repeat = options['repeat']
+        self.page_size = options['page_size']
+        host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host and host != '*'),
+            'localhost',
+        )
+        self.factory = APIRequestFactory(HTTP_HOST=host)
+        self.user = (
+            User.objects.annotate(
+                favorites_total=Count('favorites', distinct=True),
+                carts_total=Count('carts', distinct=True),
+            ).order_by('-carts_total', '-favorites_total').first()
+        )
+        self.author = (
+            User.objects.annotate(total=Count('recipes'))
+            .order_by('-total').first()
+        )
+
+        results = {}
+        for name, func in self.get_benchmarks():
+            if options['only'] and options['only'] not in name:
+                continue
+            results[name] = self.measure(func)
+            self.stdout.write(
+                f'{name:<55}{results[name]["median_ms"]:>10.2f} мс'
+                f'{results[name]["queries"]:>6} запр.'
+            )
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f'Результаты сохранены в {options["save"]}')
+            )
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def get_request(self, path='/', user=None):
+        request = self.factory.get(path)
+        force_authenticate(request, user=user or self.user)
+        request = Request(request)
+        request.user = user or self.user
+        return request
+
+    def get_benchmarks(self):
+        benchmarks = [
+            ('RecipeDetailSerializer(many=True)', self.recipe_detail),
+            (
+                'UserSubscribeRepresentationSerializer(many=True)',
+                self.subscriptions,
+            ),
+            ('download_shopping_cart', self.download_shopping_cart),
+            ('RecipeCreateUpdateDetailSerializer.create', self.create_recipe),
+            ('RecipeCreateUpdateDetailSerializer.update', self.update_recipe),
+        ]
+        for query in RECIPE_FILTERS:
+            query = query.format(author_id=self.author.id)
+            benchmarks.append((
+                f'RecipeFilter[{query}]',
+                lambda query=query: self.recipe_filter(query),
+            ))
+        for prefix in INGREDIENT_PREFIXES:
+            benchmarks.append((
+                f'IngredientFilter[name={prefix}]',
+                lambda prefix=prefix: self.ingredient_filter(prefix),
+            ))
+        return benchmarks
+
+    def measure(self, func):
+        func()
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries': len(queries),
+        }
+
+    def recipe_queryset(self):
+        view = RecipeViewSet(request=self.get_request(), action='list')
+        return view.get_queryset()
+
+    def recipe_detail(self):
+        recipes = self.recipe_queryset()[:self.page_size]
+        return RecipeDetailSerializer(
+            recipes, many=True, context={'request': self.get_request()}
+        ).data
+
+    def subscriptions(self):
+        request = self.get_request('/?recipes_limit=3')
+        authors = User.objects.annotate(
+            total=Count('recipes')
+        ).order_by('-total')[:self.page_size]
+        return UserSubscribeRepresentationSerializer(
+            authors, many=True, context={'request': request}
+        ).data
+
+    def recipe_filter(self, query):
+        request = self.get_request()
+        return list(RecipeFilter(
+            data=QueryDict(query), queryset=self.recipe_queryset(),
+            request=request,
+        ).qs[:self.page_size])
+
+    def ingredient_filter(self, prefix):
+        return list(IngredientFilter(
+            data=QueryDict(f'name={prefix}'),
+            queryset=Ingredient.objects.all(),
+        ).qs)
+
+    def download_shopping_cart(self):
+        view = RecipeViewSet.as_view({'get': 'download_shopping_cart'})
+        request = self.factory.get('/api/recipes/download_shopping_cart/')
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def recipe_payload(self):
+        ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)[:10]
+        )
+        return {
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredients
+            ],
+            'name': 'Замер',
+            'image': PIXEL_GIF,
+            'text': 'Рецепт для замера производительности.',
+            'cooking_time': 30,
+        }
+
+    def save_and_rollback(self, serializer):
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                recipe = serializer.save()
+                raise Rollback
+        except Rollback:
+            recipe.image.delete(save=False)
+
+    def create_recipe(self):
+        self.save_and_rollback(RecipeCreateUpdateDetailSerializer(
+            data=self.recipe_payload(),
+            context={'request': self.get_request()},
+        ))
+
+    def update_recipe(self):
+        recipe = Recipe.objects.filter(author=self.author).first()
+        self.save_and_rollback(RecipeCreateUpdateDetailSerializer(
+            recipe, data=self.recipe_payload(),
+            context={'request': self.get_request(user=self.author)},
+        ))
+
+    def compare(self, results, path, threshold):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]['median_ms']
+            change = (result['median_ms'] - before) / before if before else 0
+            line = (
+                f'{name:<55}{before:>10.2f} -> {result["median_ms"]:.2f} мс '
+                f'({change:+.0%})'
+            )
+            if change > threshold:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(
+                f'Замедление больше {threshold:.0%}: {", ".join(regressions)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
@@ -0,0 +1,229 @@
+import hashlib
+import multiprocessing
+import random
+import tempfile
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'mmap': 'foodgram.mmap_cache.MmapCache',
+}
+# LocMemCache у каждого процесса свой, поэтому в многопроцессных
+# замерах и стресс-тесте он не участвует.
+SHARED_BACKENDS = ('filebased', 'mmap')
+STRESS_COUNTER_KEY = 'stress:counter'
+STRESS_KEYS_PER_PROCESS = 50
+
+
+def create_cache(backend, location, slots, slot_size):
+    params = {
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': slots,
+            'SLOTS': slots,
+            'SLOT_SIZE': slot_size,
+        },
+    }
+    return import_string(BACKENDS[backend])(location, params)
+
+
+def stress_value(worker, number, value_size):
+    payload = random.Random(worker * 1000003 + number).randbytes(value_size)
+    return worker, number, payload, hashlib.sha256(payload).digest()
+
+
+def mixed_worker(backend, location, slots, slot_size, keys, operations,
+                 value, seed, queue):
+    cache = create_cache(backend, location, slots, slot_size)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'bench:{rng.randrange(keys)}'
+        if rng.random() < 0.9:
+            cache.get(key)
+        else:
+            cache.set(key, value)
+    queue.put(time.perf_counter() - started)
+
+
+def stress_worker(backend, location, slots, slot_size, worker, processes,
+                  operations, value_size, queue):
+    cache = create_cache(backend, location, slots, slot_size)
+    rng = random.Random(worker)
+    corrupted = 0
+    for number in range(operations):
+        cache.incr(STRESS_COUNTER_KEY)
+        cache.set(
+            f'stress:{worker}:{number % STRESS_KEYS_PER_PROCESS}',
+            stress_value(worker, number, value_size),
+        )
+        other = rng.randrange(processes)
+        value = cache.get(
+            f'stress:{other}:{rng.randrange(STRESS_KEYS_PER_PROCESS)}'
+        )
+        if value is not None:
+            owner, owner_number, payload, checksum = value
+            if (
+                owner != other
+                or hashlib.sha256(payload).digest() != checksum
+                or value != stress_value(owner, owner_number, value_size)
+            ):
+                corrupted += 1
+    queue.put(corrupted)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер кеша в общей памяти (mmap) против LocMemCache и '
+        'FileBasedCache и многопроцессный стресс-тест'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations', type=int, default=20000,
+            help='Количество операций каждого вида на процесс',
+        )
+        parser.add_argument(
+            '--keys', type=int, default=1000,
+            help='Количество различных ключей',
+        )
+        parser.add_argument(
+            '--value-size', type=int, default=1024,
+            help='Размер значения в байтах',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=4,
+            help='Количество процессов в многопроцессных замерах',
+        )
+        parser.add_argument(
+            '--slots', type=int, default=8192,
+            help='Число слотов mmap-кеша (MAX_ENTRIES остальных)',
+        )
+        parser.add_argument(
+            '--slot-size', type=int, default=32768,
+            help='Размер слота mmap-кеша в байтах',
+        )
+        parser.add_argument(
+            '--stress', action='store_true',
+            help='Запустить только стресс-тест',
+        )
+        parser.add_argument(
+            '--backend', choices=SHARED_BACKENDS, default='mmap',
+            help='Кеш для стресс-теста',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.context = multiprocessing.get_context('fork')
+        if options['stress']:
+            self.stress(options['backend'])
+            return
+        self.stdout.write(
+            f'{"кеш":<12}{"операция":<22}{"оп/с":>12}{"мкс/оп":>10}'
+        )
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as location:
+                self.single_process(backend, location)
+        for backend in SHARED_BACKENDS:
+            with tempfile.TemporaryDirectory() as location:
+                self.multi_process(backend, location)
+
+    def cache_args(self, backend, location):
+        return (
+            backend, location, self.options['slots'],
+            self.options['slot_size'],
+        )
+
+    def report(self, backend, operation, count, elapsed):
+        self.stdout.write(
+            f'{backend:<12}{operation:<22}{count / elapsed:>12.0f}'
+            f'{elapsed / count * 1e6:>10.1f}'
+        )
+
+    def measure(self, backend, operation, function, keys):
+        started = time.perf_counter()
+        for key in keys:
+            function(key)
+        self.report(
+            backend, operation, len(keys), time.perf_counter() - started
+        )
+
+    def single_process(self, backend, location):
+        cache = create_cache(*self.cache_args(backend, location))
+        rng = random.Random(0)
+        value = rng.randbytes(self.options['value_size'])
+        keys = [
+            f'bench:{rng.randrange(self.options["keys"])}'
+            for _ in range(self.options['operations'])
+        ]
+        self.measure(backend, 'set', lambda key: cache.set(key, value), keys)
+        self.measure(backend, 'get (попадание)', cache.get, keys)
+        self.measure(
+            backend, 'get (промах)', cache.get,
+            [f'missing:{key}' for key in keys],
+        )
+        cache.set('bench:counter', 0)
+        self.measure(
+            backend, 'incr', lambda key: cache.incr('bench:counter'), keys
+        )
+
+    def run_processes(self, target, arguments):
+        queue = self.context.Queue()
+        processes = [
+            self.context.Process(target=target, args=(*args, queue))
+            for args in arguments
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return results
+
+    def multi_process(self, backend, location):
+        processes = self.options['processes']
+        operations = self.options['operations']
+        value = random.Random(0).randbytes(self.options['value_size'])
+        started = time.perf_counter()
+        self.run_processes(mixed_worker, [
+            (
+                *self.cache_args(backend, location), self.options['keys'],
+                operations, value, seed,
+            )
+            for seed in range(processes)
+        ])
+        self.report(
+            backend, f'90% get, {processes} проц.',
+            processes * operations, time.perf_counter() - started,
+        )
+
+    def stress(self, backend):
+        processes = self.options['processes']
+        operations = self.options['operations']
+        with tempfile.TemporaryDirectory() as location:
+            cache_args = self.cache_args(backend, location)
+            cache = create_cache(*cache_args)
+            cache.set(STRESS_COUNTER_KEY, 0)
+            started = time.perf_counter()
+            corrupted = sum(self.run_processes(stress_worker, [
+                (
+                    *cache_args, worker, processes, operations,
+                    self.options['value_size'],
+                )
+                for worker in range(processes)
+            ]))
+            elapsed = time.perf_counter() - started
+            counter = cache.get(STRESS_COUNTER_KEY)
+        expected = processes * operations
+        self.stdout.write(
+            f'{backend}: {processes} процессов по {operations} итераций '
+            f'за {elapsed:.1f} с; счётчик {counter} из {expected}, '
+            f'повреждённых значений: {corrupted}'
+        )
+        if counter != expected or corrupted:
+            raise CommandError('Стресс-тест не пройден.')
+        self.stdout.write(self.style.SUCCESS('Стресс-тест пройден.'))
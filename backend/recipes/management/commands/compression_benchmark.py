@@ -0,0 +1,100 @@
+import statistics
+import time
+
+from api.views import RecipeViewSet
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+from foodgram.compression import brotli, compress
+from recipes.models import Recipe, User
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 11)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер затрат CPU на сжатие gzip и brotli против сэкономленных '
+        'байт на реальных ответах API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-sizes', type=str, default='6,24,100',
+            help='Размеры страниц списка рецептов через запятую',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество повторов сжатия каждого ответа',
+        )
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError(
+                'Нет рецептов, сначала запустите generate_data.'
+            )
+        host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host and host != '*'),
+            'localhost',
+        )
+        self.factory = APIRequestFactory(HTTP_HOST=host)
+        self.user = User.objects.annotate(
+            total=Count('carts')
+        ).order_by('-total').first()
+        self.repeat = options['repeat']
+        codecs = [('gzip', level) for level in GZIP_LEVELS]
+        if brotli is not None:
+            codecs += [('br', quality) for quality in BROTLI_QUALITIES]
+        else:
+            self.stdout.write(
+                self.style.WARNING('Brotli не установлен, только gzip.')
+            )
+        self.stdout.write(
+            f'{"ответ":<28}{"сжатие":<10}{"байт":>10}{"итог":>10}'
+            f'{"доля":>7}{"мс":>8}{"МБ/с":>8}{"мкс/КБ экон.":>14}'
+        )
+        for name, content in self.get_bodies(options['page_sizes']):
+            self.stdout.write(f'{name:<28}{"-":<10}{len(content):>10}')
+            for encoding, level in codecs:
+                self.measure(name, content, encoding, level)
+
+    def get_bodies(self, page_sizes):
+        view = RecipeViewSet.as_view({'get': 'list'})
+        for page_size in page_sizes.split(','):
+            path = f'/api/recipes/?limit={int(page_size)}'
+            yield f'recipes?limit={page_size}', self.render(view, path)
+        detail = RecipeViewSet.as_view({'get': 'retrieve'})
+        recipe = Recipe.objects.order_by('-id').first()
+        yield 'recipes/{id}', self.render(
+            detail, f'/api/recipes/{recipe.id}/', pk=recipe.id
+        )
+        cart = RecipeViewSet.as_view({'get': 'download_shopping_cart'})
+        yield 'download_shopping_cart', self.render(
+            cart, '/api/recipes/download_shopping_cart/'
+        )
+
+    def render(self, view, path, **kwargs):
+        request = self.factory.get(path)
+        force_authenticate(request, user=self.user)
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.content
+
+    def measure(self, name, content, encoding, level):
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            compressed = compress(content, encoding, level)
+            timings.append(time.perf_counter() - started)
+        elapsed = statistics.median(timings)
+        saved_kb = (len(content) - len(compressed)) / 1024
+        per_saved_kb = elapsed * 1e6 / saved_kb if saved_kb > 0 else 0
+        self.stdout.write(
+            f'{"":<28}{f"{encoding}:{level}":<10}{"":>10}'
+            f'{len(compressed):>10}{len(compressed) / len(content):>7.1%}'
+            f'{elapsed * 1e3:>8.2f}{len(content) / elapsed / 1e6:>8.0f}'
+            f'{per_saved_kb:>14.1f}'
+        )
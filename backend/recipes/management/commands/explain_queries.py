@@ -0,0 +1,152 @@
+import re
+
+from api.views import RecipeViewSet
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, User)
+
+from .generate_data import generate_recipes
+
+POSTGRESQL_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+# В SQLite поиск по индексу выводится как SEARCH, а SCAN означает перебор
+# всей таблицы или всего индекса (USING COVERING INDEX) без условия.
+SQLITE_FULL_SCAN = re.compile(
+    r'\bSCAN (?:TABLE )?(?!CONSTANT ROW|SUBQUERY )(\w+)'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполнить EXPLAIN для горячих запросов и завершиться с ошибкой, '
+        'если какой-то из них читает большую таблицу полным перебором'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=0,
+            help='Догенерировать данные до указанного числа рецептов',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help='Генерировать данные без подтверждения',
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='Таблицы с меньшим числом строк не проверяются',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов',
+        )
+
+    def handle(self, *args, **options):
+        generate_recipes(self, options['recipes'], options['interactive'])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        failures = []
+        for name, queryset in self.get_queries():
+            plan = queryset.explain()
+            scanned = [
+                table for table in self.get_full_scans(plan)
+                if self.get_table_rows(table) >= options['min_rows']
+            ]
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: полный перебор {", ".join(scanned)}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if scanned or options['verbose_plans']:
+                self.stdout.write(plan)
+        if failures:
+            raise CommandError(
+                f'Полный перебор больших таблиц: {", ".join(failures)}'
+            )
+
+    def get_queries(self):
+        user = (
+            User.objects.filter(carts__isnull=False).first()
+            or User.objects.first()
+        )
+        author = User.objects.order_by('-recipes_count').first()
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        if not all((user, author, recipe)):
+            raise CommandError(
+                'Нет данных для проверки, используйте --recipes.'
+            )
+        return (
+            (
+                'Ингредиенты по началу названия',
+                Ingredient.objects.filter(name__istartswith='сах'),
+            ),
+            (
+                'Рецепты автора',
+                Recipe.objects.filter(author=author).order_by('-id')[:6],
+            ),
+            (
+                'Избранное по пользователю и рецепту',
+                Favorite.objects.filter(user=user, recipe=recipe),
+            ),
+            (
+                'Избранное по рецепту',
+                Favorite.objects.filter(recipe=recipe),
+            ),
+            (
+                'Список покупок по пользователю и рецепту',
+                ShoppingCart.objects.filter(user=user, recipe=recipe),
+            ),
+            (
+                'Список покупок по рецепту',
+                ShoppingCart.objects.filter(recipe=recipe),
+            ),
+            (
+                'Подписчики автора',
+                Subscribe.objects.filter(author=author),
+            ),
+            (
+                'Подписки пользователя',
+                User.objects.filter(subscribing__user=user),
+            ),
+            (
+                'Ингредиенты рецептов',
+                RecipeIngredient.objects.filter(recipe=recipe),
+            ),
+            (
+                'Агрегация списка покупок',
+                RecipeViewSet.get_shopping_cart_ingredients(user),
+            ),
+        )
+
+    def get_full_scans(self, plan):
+        pattern = (
+            POSTGRESQL_SEQ_SCAN if connection.vendor == 'postgresql'
+            else SQLITE_FULL_SCAN
+        )
+        return {
+            match.group(1)
+            for line in plan.splitlines()
+            for match in [pattern.search(line)] if match
+        }
+
+    def get_table_rows(self, table):
+        if table not in connection.introspection.table_names():
+            # Псевдоним таблицы в подзапросе: размер неизвестен,
+            # перебор считается недопустимым.
+            return float('inf')
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [table],
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row else 0
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+            )
+            return cursor.fetchone()[0]
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from recipes.dumps import (DUMP_FORMAT, MANIFEST_FILE, encode_row,
+                           format_throughput, get_dump_models, get_dump_path,
+                           get_restore_levels)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузить данные приложения recipes в NDJSON по файлу на модель '
+        'с постоянным расходом памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', type=str, default='dump',
+            help='Каталог выгрузки',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Количество строк, читаемых из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        self.chunk_size = options['chunk_size']
+        os.makedirs(path, exist_ok=True)
+        dump_models = [
+            model for level in get_restore_levels(get_dump_models())
+            for model in level
+        ]
+        manifest = {'format': DUMP_FORMAT, 'models': []}
+        started = time.perf_counter()
+        total_rows = total_bytes = 0
+        # Все таблицы читаются из одного снимка базы.
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ '
+                        'READ ONLY'
+                    )
+            for model in dump_models:
+                rows, size = self.export_model(model, path)
+                manifest['models'].append(
+                    {'model': model._meta.label_lower, 'rows': rows}
+                )
+                total_rows += rows
+                total_bytes += size
+        with open(
+            os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8'
+        ) as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено {total_rows} строк, '
+            + format_throughput(
+                total_rows, total_bytes, time.perf_counter() - started
+            )
+        ))
+
+    def export_model(self, model, path):
+        label = model._meta.label_lower
+        fields = model._meta.concrete_fields
+        total = model._base_manager.count()
+        rows = (
+            model._base_manager.order_by('pk')
+            .values_list(*(field.attname for field in fields))
+            .iterator(chunk_size=self.chunk_size)
+        )
+        started = time.perf_counter()
+        done = 0
+        dump_path = get_dump_path(path, model)
+        with open(dump_path, 'w', encoding='utf-8') as file:
+            for values in rows:
+                file.write(encode_row(fields, values) + '\n')
+                done += 1
+                if done % self.chunk_size == 0:
+                    self.stdout.write(f'{label}: {done}/{total}')
+        size = os.path.getsize(dump_path)
+        self.stdout.write(
+            f'{label}: {done} строк, '
+            + format_throughput(done, size, time.perf_counter() - started)
+        )
+        return done, size
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management import BaseCommand
+from recipes.constants import DUPLICATE_THRESHOLD
+from recipes.duplicates import duplicate_clusters, index_recipes
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Найти группы почти одинаковых рецептов по MinHash-сигнатурам '
+        'ингредиентов и слов названия'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index', action='store_true',
+            help='Пересчитать сигнатуры всех рецептов перед поиском',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=DUPLICATE_THRESHOLD,
+            help='Минимальное оценочное сходство Жаккара',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Количество выводимых групп',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Размер пачки рецептов при расчёте сигнатур',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['index']:
+            self.index(options['chunk_size'])
+        clusters = duplicate_clusters(
+            options['threshold'], options['chunk_size']
+        )
+        names = dict(Recipe.objects.filter(id__in=[
+            recipe_id
+            for cluster in clusters[:options['limit']]
+            for recipe_id in cluster
+        ]).values_list('id', 'name'))
+        for cluster in clusters[:options['limit']]:
+            self.stdout.write(', '.join(
+                f'{recipe_id} «{names.get(recipe_id, "")}»'
+                for recipe_id in cluster
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Найдено групп дубликатов: {len(clusters)} за '
+            f'{time.monotonic() - started:.1f} с.'
+        ))
+
+    def index(self, chunk_size):
+        recipe_ids = list(
+            Recipe.objects.order_by('id').values_list('id', flat=True)
+        )
+        for start in range(0, len(recipe_ids), chunk_size):
+            index_recipes(recipe_ids[start:start + chunk_size])
+            self.stdout.write(
+                f'Сигнатуры: {min(start + chunk_size, len(recipe_ids))}'
+                f'/{len(recipe_ids)}'
+            )
@@ -0,0 +1,304 @@
+import csv
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from recipes.constants import TIME_MAX_VALUE, TIME_MIN_VALUE
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, Tag, User)
+from recipes.pantry import invalidate_pantry
+
+TAGS = (
+    {'name': 'Завтрак', 'slug': 'breakfast'},
+    {'name': 'Обед', 'slug': 'lunch'},
+    {'name': 'Ужин', 'slug': 'dinner'},
+)
+RECIPE_WORDS = (
+    'Суп', 'Салат', 'Пирог', 'Запеканка', 'Рагу', 'Каша', 'Омлет',
+    'Паста', 'Плов', 'Котлеты', 'Блины', 'Соус', 'Десерт', 'Жаркое',
+)
+RECIPE_TEXT = (
+    'Подготовьте ингредиенты, смешайте их в нужной последовательности '
+    'и готовьте до готовности. '
+)
+PLACEHOLDER_IMAGE = 'recipes/placeholder.png'
+ACTIVITY_DAYS = 90
+
+
+def generate_recipes(command, recipes, interactive=True):
+    """Догенерирует данные до recipes рецептов для команд замеров.
+
+    Генерация пишет в базу по умолчанию, поэтому без --no-input команда
+    спрашивает подтверждение с именем базы.
+    """
+    missing = recipes - Recipe.objects.count()
+    if missing <= 0:
+        return
+    database = connection.settings_dict['NAME']
+    if interactive:
+        try:
+            answer = input(
+                f'В базу {database} будет добавлено {missing} рецептов '
+                'и пользователи к ним. Продолжить? [y/N] '
+            )
+        except EOFError:
+            answer = ''
+        if answer.strip().lower() not in ('y', 'yes', 'д', 'да'):
+            raise CommandError('Генерация данных отменена.')
+    call_command(
+        'generate_data', users=max(recipes // 10, 10), recipes=missing,
+        stdout=command.stdout,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сгенерировать воспроизводимый синтетический набор данных: '
+        'пользователей, рецепты, избранное, корзины и подписки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей',
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Количество рецептов',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Размер пачки для bulk_create',
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее количество рецептов в избранном у пользователя',
+        )
+        parser.add_argument(
+            '--carts', type=float, default=5,
+            help='Среднее количество рецептов в корзине у пользователя',
+        )
+        parser.add_argument(
+            '--subscriptions', type=float, default=10,
+            help='Среднее количество подписок у пользователя',
+        )
+        parser.add_argument(
+            '--path', type=str, default='data/ingredients.csv',
+            help='Путь к CSV-файлу с ингредиентами',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+
+        self.ensure_ingredients(options['path'])
+        tag_ids = self.ensure_tags()
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tag_ids
+        )
+        self.create_relations(
+            Favorite, 'recipe', user_ids, recipe_ids, options['favorites']
+        )
+        self.create_relations(
+            ShoppingCart, 'recipe', user_ids, recipe_ids, options['carts']
+        )
+        self.create_relations(
+            Subscribe, 'author', user_ids, user_ids,
+            options['subscriptions'],
+        )
+        self.reset_sequences()
+        call_command(
+            'recount', chunk_size=self.chunk_size, stdout=self.stdout
+        )
+        call_command('rebuild_feeds', stdout=self.stdout)
+        invalidate_pantry()
+        self.stdout.write(self.style.SUCCESS('Генерация данных завершена.'))
+
+    def ensure_ingredients(self, path):
+        """Загружает ингредиенты из CSV, если справочник пуст."""
+        if Ingredient.objects.exists():
+            return
+        with open(path, 'rt', encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=row[0], measurement_unit=row[1])
+                    for row in csv.reader(file, dialect='excel') if row[0]
+                ),
+                batch_size=self.chunk_size,
+            )
+
+    def ensure_tags(self):
+        for tag_data in TAGS:
+            Tag.objects.get_or_create(**tag_data)
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def create_users(self, count):
+        """Создаёт пользователей с явными id, чтобы не перечитывать их."""
+        start = self.next_id(User)
+        password = make_password('password')
+        for chunk_start in range(start, start + count, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, start + count)
+            User.objects.bulk_create([
+                User(
+                    id=user_id,
+                    username=f'user{user_id}',
+                    email=f'user{user_id}@example.com',
+                    first_name=f'Имя{user_id}',
+                    last_name=f'Фамилия{user_id}',
+                    password=password,
+                )
+                for user_id in range(chunk_start, chunk_end)
+            ])
+            self.report('Пользователи', chunk_end - start, count)
+        return list(range(start, start + count))
+
+    def zipf_weights(self, size, exponent=1.1):
+        """Кумулятивные веса степенного распределения популярности."""
+        return list(accumulate(
+            1 / (rank ** exponent) for rank in range(1, size + 1)
+        ))
+
+    def popular_sample(self, population, cum_weights, count):
+        """Выборка без повторов, смещённая к популярным элементам."""
+        count = min(count, len(population))
+        sample = set()
+        attempts = 0
+        while len(sample) < count and attempts < count * 10:
+            sample.update(self.rng.choices(
+                population, cum_weights=cum_weights, k=count - len(sample)
+            ))
+            attempts += count
+        return sample
+
+    def create_recipes(self, count, user_ids, tag_ids):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        self.rng.shuffle(ingredient_ids)
+        ingredient_weights = self.zipf_weights(len(ingredient_ids))
+        author_ids = user_ids[:]
+        self.rng.shuffle(author_ids)
+        author_weights = self.zipf_weights(len(author_ids))
+        start = self.next_id(Recipe)
+        recipe_tags = Recipe.tags.through
+
+        for chunk_start in range(start, start + count, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, start + count)
+            recipes, ingredients, tags = [], [], []
+            for recipe_id in range(chunk_start, chunk_end):
+                recipes.append(Recipe(
+                    id=recipe_id,
+                    name=(
+                        f'{self.rng.choice(RECIPE_WORDS)} '
+                        f'№{recipe_id}'
+                    ),
+                    text=RECIPE_TEXT * self.rng.randint(1, 10),
+                    image=PLACEHOLDER_IMAGE,
+                    author_id=self.rng.choices(
+                        author_ids, cum_weights=author_weights
+                    )[0],
+                    cooking_time=min(
+                        max(int(self.rng.lognormvariate(3.4, 0.6)),
+                            TIME_MIN_VALUE),
+                        TIME_MAX_VALUE,
+                    ),
+                ))
+                ingredients.extend(
+                    RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=self.rng.randint(1, 500),
+                    )
+                    for ingredient_id in self.popular_sample(
+                        ingredient_ids, ingredient_weights,
+                        self.rng.randint(3, 15),
+                    )
+                )
+                tags.extend(
+                    recipe_tags(recipe_id=recipe_id, tag_id=tag_id)
+                    for tag_id in self.rng.sample(
+                        tag_ids, self.rng.randint(1, len(tag_ids))
+                    )
+                )
+            with transaction.atomic():
+                Recipe.objects.bulk_create(recipes)
+                RecipeIngredient.objects.bulk_create(
+                    ingredients, batch_size=self.chunk_size
+                )
+                recipe_tags.objects.bulk_create(
+                    tags, batch_size=self.chunk_size
+                )
+            self.report('Рецепты', chunk_end - start, count)
+        return list(range(start, start + count))
+
+    def create_relations(self, model, target_field, user_ids, target_ids,
+                         mean):
+        """Создаёт связи пользователей с целями по степенному закону."""
+        targets = target_ids[:]
+        self.rng.shuffle(targets)
+        target_weights = self.zipf_weights(len(targets))
+        pareto_alpha = 2.0
+        scale = mean * (pareto_alpha - 1) / pareto_alpha
+        timestamped = any(
+            field.name == 'created' for field in model._meta.fields
+        )
+        now = timezone.now()
+        created = 0
+        for chunk_start in range(0, len(user_ids), self.chunk_size):
+            chunk = user_ids[chunk_start:chunk_start + self.chunk_size]
+            # Уже существующие связи читаются только для пачки
+            # пользователей, а не для всей таблицы.
+            existing = set(
+                model.objects.filter(user_id__in=chunk)
+                .values_list('user_id', f'{target_field}_id')
+            )
+            batch = []
+            for user_id in chunk:
+                count = int(scale * self.rng.paretovariate(pareto_alpha))
+                for target_id in self.popular_sample(
+                    targets, target_weights, count
+                ):
+                    if target_id == user_id and model is Subscribe:
+                        continue
+                    if (user_id, target_id) in existing:
+                        continue
+                    relation = model(
+                        user_id=user_id,
+                        **{f'{target_field}_id': target_id},
+                    )
+                    if timestamped:
+                        relation.created = now - timedelta(
+                            seconds=self.rng.uniform(
+                                0, ACTIVITY_DAYS * 86400
+                            )
+                        )
+                    batch.append(relation)
+            model.objects.bulk_create(batch, batch_size=self.chunk_size)
+            created += len(batch)
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: создано {created}.'
+        )
+
+    def reset_sequences(self):
+        """Сдвигает последовательности после вставки с явными id."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Recipe]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def report(self, label, done, total):
+        self.stdout.write(f'{label}: {done}/{total}')
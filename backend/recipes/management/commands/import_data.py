@@ -0,0 +1,234 @@
+import json
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from recipes.caches import (clear_ingredient_lists, clear_recipe_first_page,
+                            clear_tag_ids, clear_tag_list)
+from recipes.dumps import (DUMP_FORMAT, MANIFEST_FILE, decode_row,
+                           format_throughput, get_dump_models, get_dump_path,
+                           get_restore_levels)
+from recipes.pantry import invalidate_pantry
+
+PROGRESS_INTERVAL = 0.5
+
+_progress = None
+
+
+def restore_model(model, path, batch_size, report):
+    """Загружает файл модели пачками bulk_create в одной транзакции.
+
+    Проверка внешних ключей откладывается до конца загрузки таблицы:
+    SQLite отключает её, PostgreSQL проверяет отложенные ограничения
+    при check_constraints.
+    """
+    label = model._meta.label_lower
+    fields = model._meta.concrete_fields
+    dump_path = get_dump_path(path, model)
+    started = time.perf_counter()
+    done = 0
+    with connection.constraint_checks_disabled(), transaction.atomic():
+        with open(dump_path, encoding='utf-8') as file:
+            batch = []
+            for line in file:
+                batch.append(model(**decode_row(fields, line)))
+                if len(batch) >= batch_size:
+                    model._base_manager.bulk_create(batch)
+                    done += len(batch)
+                    batch = []
+                    report(label, done, None)
+            model._base_manager.bulk_create(batch)
+            done += len(batch)
+        connection.check_constraints(table_names=[model._meta.db_table])
+    report(label, done, time.perf_counter() - started)
+    return done
+
+
+def init_worker(progress):
+    global _progress
+    _progress = progress
+
+
+def restore_in_worker(label, path, batch_size):
+    model = {
+        model._meta.label_lower: model for model in get_dump_models()
+    }[label]
+    try:
+        return restore_model(
+            model, path, batch_size,
+            lambda *message: _progress.put(message),
+        )
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузить выгрузку export_data в пустую базу: модели по порядку '
+        'зависимостей, независимые таблицы — в параллельных процессах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', type=str, default='dump',
+            help='Каталог выгрузки',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пачки для bulk_create',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=min(os.cpu_count() or 1, 4),
+            help='Количество процессов загрузки независимых таблиц',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        if connection.vendor == 'sqlite':
+            # SQLite допускает одну пишущую транзакцию за раз.
+            self.workers = 1
+        dump_models = self.get_models(path)
+        not_empty = [
+            model._meta.label_lower for model in dump_models
+            if model._base_manager.exists()
+        ]
+        if not_empty:
+            raise CommandError(
+                f'Таблицы не пусты: {", ".join(not_empty)}. '
+                'Загрузка выполняется только в пустую базу.'
+            )
+        started = time.perf_counter()
+        total_rows = 0
+        for level in get_restore_levels(dump_models):
+            if self.workers > 1 and len(level) > 1:
+                total_rows += self.restore_parallel(level, path)
+            else:
+                for model in level:
+                    total_rows += restore_model(
+                        model, path, self.batch_size, self.report
+                    )
+        self.reset_sequences(dump_models)
+        self.clear_caches()
+        total_bytes = sum(
+            os.path.getsize(get_dump_path(path, model))
+            for model in dump_models
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {total_rows} строк, '
+            + format_throughput(
+                total_rows, total_bytes, time.perf_counter() - started
+            )
+        ))
+
+    def get_models(self, path):
+        try:
+            with open(
+                os.path.join(path, MANIFEST_FILE), encoding='utf-8'
+            ) as file:
+                manifest = json.load(file)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать выгрузку: {error}')
+        if manifest.get('format') != DUMP_FORMAT:
+            raise CommandError(
+                f'Неподдерживаемый формат выгрузки: {manifest.get("format")}.'
+            )
+        self.totals = {
+            entry['model']: entry['rows'] for entry in manifest['models']
+        }
+        dump_models = {
+            model._meta.label_lower: model for model in get_dump_models()
+        }
+        unknown = set(self.totals) - set(dump_models)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные модели в выгрузке: {", ".join(sorted(unknown))}.'
+            )
+        return [
+            model for label, model in dump_models.items()
+            if label in self.totals
+        ]
+
+    def report(self, label, done, elapsed):
+        total = self.totals[label]
+        if elapsed is None:
+            self.stdout.write(f'{label}: {done}/{total}')
+            return
+        self.stdout.write(
+            f'{label}: {done} строк за {elapsed:.1f} с '
+            f'({done / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+
+    def restore_parallel(self, level, path):
+        """Загружает таблицы уровня в процессах, выводя их прогресс.
+
+        Если процесс загрузки погиб (например, убит по памяти), пул
+        помечает его задачи BrokenProcessPool, и команда завершается
+        с ошибкой, а не ждёт результата бесконечно.
+        """
+        # Процессы не должны унаследовать открытое соединение.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        progress = context.Queue()
+        with ProcessPoolExecutor(
+            min(self.workers, len(level)), mp_context=context,
+            initializer=init_worker, initargs=(progress,),
+        ) as executor:
+            pending = {
+                executor.submit(
+                    restore_in_worker, model._meta.label_lower, path,
+                    self.batch_size,
+                )
+                for model in level
+            }
+            rows = 0
+            try:
+                while pending:
+                    finished, pending = wait(
+                        pending, timeout=PROGRESS_INTERVAL,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    self.report_progress(progress)
+                    for future in finished:
+                        # Поднимает исключение упавшей загрузки.
+                        rows += future.result()
+            except BrokenProcessPool:
+                raise CommandError(
+                    'Процесс загрузки аварийно завершился, загрузка '
+                    'прервана. Очистите базу перед повторной загрузкой.'
+                )
+            finally:
+                executor.shutdown(cancel_futures=True)
+        self.report_progress(progress, PROGRESS_INTERVAL)
+        return rows
+
+    def report_progress(self, progress, timeout=0):
+        """Выводит накопившиеся сообщения о прогрессе процессов."""
+        while True:
+            try:
+                self.report(*progress.get(timeout=timeout))
+            except queue.Empty:
+                return
+
+    def reset_sequences(self, dump_models):
+        """Сдвигает последовательности после вставки с явными id."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), dump_models
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def clear_caches(self):
+        clear_tag_ids()
+        clear_tag_list()
+        clear_ingredient_lists()
+        clear_recipe_first_page()
+        invalidate_pantry()
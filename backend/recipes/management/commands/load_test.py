@@ -0,0 +1,191 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Max
+from recipes.models import Ingredient, Recipe, Tag, User
+
+ENDPOINTS = {
+    'recipes': '/api/recipes/?page={page}',
+    'recipe': '/api/recipes/{recipe_id}/',
+    'recipes_by_tags': '/api/recipes/?tags={tag}&tags={other_tag}',
+    'recipes_by_author': '/api/recipes/?author={user_id}',
+    'ingredients': '/api/ingredients/',
+    'ingredients_search': '/api/ingredients/?name={prefix}',
+    'tags': '/api/tags/',
+    'users': '/api/users/?page={page}',
+    'user': '/api/users/{user_id}/',
+}
+DEFAULT_MIX = 'recipes=5,recipe=3,ingredients_search=2,tags=1,user=1'
+
+
+def percentile(values, fraction):
+    """Процентиль по отсортированному списку значений."""
+    if not values:
+        return 0.0
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон набора эндпоинтов API локального сервера '
+        'с отчётом о пропускной способности и задержках'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', type=str, default='http://localhost:8000',
+            help='Адрес сервера',
+        )
+        parser.add_argument(
+            '--mix', type=str, default=DEFAULT_MIX,
+            help=(
+                'Смесь эндпоинтов в виде имя=вес через запятую. '
+                f'Доступны: {", ".join(ENDPOINTS)}'
+            ),
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Количество параллельных клиентов',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность прогона в секундах',
+        )
+        parser.add_argument(
+            '--token', type=str, default='',
+            help='Токен авторизации для запросов',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Начальное значение генератора случайных чисел',
+        )
+
+    def parse_mix(self, mix):
+        weights = {}
+        for item in mix.split(','):
+            name, _, weight = item.partition('=')
+            name = name.strip()
+            if name not in ENDPOINTS:
+                raise CommandError(f'Неизвестный эндпоинт: {name}')
+            try:
+                weights[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(
+                    f'Некорректный вес эндпоинта {name}: {weight}'
+                )
+            if weights[name] < 0:
+                raise CommandError(
+                    f'Вес эндпоинта {name} не может быть отрицательным'
+                )
+        if not sum(weights.values()):
+            raise CommandError('Сумма весов эндпоинтов должна быть больше 0')
+        return weights
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        self.base_url = options['url'].rstrip('/')
+        self.headers = (
+            {'Authorization': f'Token {options["token"]}'}
+            if options['token'] else {}
+        )
+        self.params = {
+            'max_recipe_id': Recipe.objects.aggregate(
+                value=Max('id'))['value'] or 1,
+            'max_user_id': User.objects.aggregate(
+                value=Max('id'))['value'] or 1,
+            'tags': list(Tag.objects.values_list('slug', flat=True)) or [''],
+            'prefixes': [
+                name[:2] for name in
+                Ingredient.objects.values_list('name', flat=True)[:500]
+            ] or [''],
+        }
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        concurrency = options['concurrency']
+
+        self.stdout.write(
+            f'Прогон {options["duration"]} с, клиентов: {concurrency}...'
+        )
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            clients = [
+                executor.submit(
+                    self.run_client, mix, deadline,
+                    random.Random(options['seed'] + worker),
+                )
+                for worker in range(concurrency)
+            ]
+        failures = []
+        for client in clients:
+            try:
+                client.result()
+            except Exception as error:
+                failures.append(error)
+        self.print_report(time.monotonic() - started)
+        if failures:
+            raise CommandError(
+                f'Клиентов завершилось с ошибкой: {len(failures)} '
+                f'из {concurrency}. Первая ошибка: {failures[0]!r}'
+            )
+
+    def build_path(self, name, rng):
+        params = self.params
+        tag, other_tag = (
+            rng.choice(params['tags']), rng.choice(params['tags'])
+        )
+        return ENDPOINTS[name].format(
+            page=rng.randint(1, 20),
+            recipe_id=rng.randint(1, params['max_recipe_id']),
+            user_id=rng.randint(1, params['max_user_id']),
+            tag=tag,
+            other_tag=other_tag,
+            prefix=rng.choice(params['prefixes']),
+        )
+
+    def run_client(self, mix, deadline, rng):
+        names = list(mix)
+        weights = list(mix.values())
+        with requests.Session() as session:
+            session.headers.update(self.headers)
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights=weights)[0]
+                url = self.base_url + self.build_path(name, rng)
+                started = time.perf_counter()
+                try:
+                    response = session.get(url, timeout=30)
+                    failed = response.status_code >= 500
+                except requests.RequestException:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.latencies[name].append(elapsed)
+                    if failed:
+                        self.errors[name] += 1
+
+    def print_report(self, elapsed):
+        self.stdout.write(
+            f'{"эндпоинт":<20}{"запросов":>10}{"rps":>10}{"ошибок":>8}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+        )
+        total = 0
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            total += len(values)
+            self.stdout.write(
+                f'{name:<20}{len(values):>10}'
+                f'{len(values) / elapsed:>10.1f}{self.errors[name]:>8}'
+                f'{percentile(values, 0.50) * 1000:>10.1f}'
+                f'{percentile(values, 0.95) * 1000:>10.1f}'
+                f'{percentile(values, 0.99) * 1000:>10.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего запросов: {total}, {total / elapsed:.1f} запросов/с.'
+        ))
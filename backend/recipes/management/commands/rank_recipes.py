@@ -0,0 +1,94 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, RecipePopularity, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитать рейтинг популярности рецептов по избранному и '
+        'спискам покупок с затуханием по времени'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life', type=float, default=7,
+            help='Период полураспада веса действия в днях',
+        )
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help='Учитывать действия только за последние дни',
+        )
+        parser.add_argument(
+            '--favorite-weight', type=float, default=1.0,
+            help='Вес добавления в избранное',
+        )
+        parser.add_argument(
+            '--cart-weight', type=float, default=0.5,
+            help='Вес добавления в список покупок',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Размер пачки для bulk_create',
+        )
+        parser.add_argument(
+            '--every', type=int, default=0,
+            help='Повторять пересчёт каждые N секунд',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            ranked = self.rank(options)
+            self.stdout.write(self.style.SUCCESS(
+                f'Рейтинг пересчитан для {ranked} рецептов за '
+                f'{time.monotonic() - started:.1f} с.'
+            ))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+    def rank(self, options):
+        today = timezone.now().date()
+        horizon = timezone.now() - timedelta(days=options['days'])
+        scores = defaultdict(float)
+        for model, weight in (
+            (Favorite, options['favorite_weight']),
+            (ShoppingCart, options['cart_weight']),
+        ):
+            daily = (
+                model.objects.filter(created__gte=horizon)
+                .annotate(day=TruncDate('created'))
+                .values_list('recipe_id', 'day')
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            for recipe_id, day, total in daily.iterator():
+                age = (today - day).days
+                scores[recipe_id] += (
+                    weight * total * 0.5 ** (age / options['half_life'])
+                )
+
+        recipe_ids = list(scores)
+        chunk_size = options['chunk_size']
+        ranked = 0
+        with transaction.atomic():
+            RecipePopularity.objects.all().delete()
+            for start in range(0, len(recipe_ids), chunk_size):
+                # Рецепты могли удалить, пока считался рейтинг.
+                existing = Recipe.objects.filter(
+                    id__in=recipe_ids[start:start + chunk_size]
+                ).values_list('id', flat=True)
+                ranked += len(RecipePopularity.objects.bulk_create([
+                    RecipePopularity(
+                        recipe_id=recipe_id, score=scores[recipe_id]
+                    )
+                    for recipe_id in existing
+                ]))
+        return ranked
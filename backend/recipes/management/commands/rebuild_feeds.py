@@ -0,0 +1,68 @@
+from django.core.management import BaseCommand
+from django.db.models import Max
+from recipes.feeds import (backfill_author_feeds, rebuild_feeds,
+                           reset_feed_modes)
+from recipes.models import FeedBackfill, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобрать ленты подписок пользователей пачками по диапазонам id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='Пересобрать ленту только одного пользователя',
+        )
+        parser.add_argument(
+            '--author', type=int,
+            help='Скопировать рецепты автора в ленты его подписчиков',
+        )
+        parser.add_argument(
+            '--backfill', action='store_true',
+            help='Разобрать очередь авторов для заполнения лент',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Количество пользователей в одной пачке',
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            created = rebuild_feeds(options['user'], options['user'] + 1)
+            self.stdout.write(self.style.SUCCESS(
+                f'Лента пересобрана, записей: {created}.'
+            ))
+            return
+
+        if options['author'] or options['backfill']:
+            author_ids = (
+                [options['author']] if options['author']
+                else FeedBackfill.objects.values_list('author_id', flat=True)
+            )
+            for author_id in list(author_ids):
+                self.backfill(author_id)
+            self.stdout.write(self.style.SUCCESS('Ленты заполнены.'))
+            return
+
+        reset_feed_modes()
+        chunk_size = options['chunk_size']
+        max_id = User.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        created = 0
+        for start in range(1, max_id + 1, chunk_size):
+            created += rebuild_feeds(start, start + chunk_size)
+            self.stdout.write(
+                f'Пользователи до {min(start + chunk_size - 1, max_id)}: '
+                f'записей {created}.'
+            )
+        self.stdout.write(self.style.SUCCESS('Ленты пересобраны.'))
+
+    def backfill(self, author_id):
+        created = backfill_author_feeds(author_id)
+        if created is None:
+            self.stdout.write(
+                f'Автор {author_id}: рецепты подмешиваются при чтении.'
+            )
+        else:
+            self.stdout.write(f'Автор {author_id}: записей {created}.')
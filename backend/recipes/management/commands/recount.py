@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from recipes.counters import COUNTERS, count_subquery
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитать счётчики избранного, списков покупок, рецептов '
+        'и подписчиков пачками по диапазонам id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Количество строк в одном UPDATE',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for model, field, source, foreign_key in COUNTERS:
+            max_id = model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+            updated = 0
+            for start in range(1, max_id + 1, chunk_size):
+                with transaction.atomic():
+                    updated += model.objects.filter(
+                        pk__gte=start, pk__lt=start + chunk_size
+                    ).update(**{field: count_subquery(source, foreign_key)})
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'пересчитано {updated}.'
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -1,8 +1,26 @@
+import hashlib
+import json
 import os
+import time
+from contextlib import contextmanager
 
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.finders import get_finders
 from django.core.management import BaseCommand, call_command
-from recipes.models import Tag
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from recipes.models import SetupFingerprint, Tag
+
+TAGS = (
+    {'name': 'Завтрак', 'slug': 'breakfast'},
+    {'name': 'Обед', 'slug': 'lunch'},
+    {'name': 'Ужин', 'slug': 'dinner'},
+)
+INGREDIENTS_PATH = 'data/ingredients.csv'
+STATIC_HASH_FILE = '.static_hash'
 
 
 class Command(BaseCommand):
@@ -11,6 +29,18 @@ class Command(BaseCommand):
         'тегов, запуск миграций'
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Выполнить все этапы без проверки отпечатков',
+        )
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        yield
+        self.timings.append((name, time.monotonic() - started))
+
     def handle(self, *args, **options):
         admin_username = os.getenv('ADMIN_USERNAME')
         admin_email = os.getenv('ADMIN_EMAIL')
@@ -23,54 +53,138 @@ class Command(BaseCommand):
             )
             return
 
-        call_command('makemigrations')
-        call_command('migrate', '--noinput')
+        self.force = options['force']
+        self.timings = []
+        started = time.monotonic()
+
+        if settings.DEBUG:
+            with self.phase('makemigrations'):
+                call_command('makemigrations')
+        with self.phase('migrate'):
+            self.migrate()
+        with self.phase('seed'):
+            self.seed(admin_username, admin_email, admin_password)
+        with self.phase('collectstatic'):
+            self.collect_static()
+
+        self.stdout.write('Этапы запуска:')
+        for name, elapsed in self.timings:
+            self.stdout.write(f'  {name:<16}{elapsed:>8.2f} с')
+        self.stdout.write(self.style.SUCCESS(
+            f'  {"всего":<16}{time.monotonic() - started:>8.2f} с'
+        ))
+
+    def migrate(self):
+        """Применяет миграции, только если план миграций не пуст."""
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan or self.force:
+            call_command('migrate', '--noinput')
+        else:
+            self.stdout.write('Все миграции применены. Пропуск.')
+
+    def get_fingerprint(self, name):
+        fingerprint = SetupFingerprint.objects.filter(name=name).first()
+        return fingerprint.value if fingerprint else None
+
+    def set_fingerprint(self, name, value):
+        SetupFingerprint.objects.update_or_create(
+            name=name, defaults={'value': value}
+        )
 
+    def seed_fingerprint(self, admin_username, admin_email):
+        digest = hashlib.sha256()
+        with open(INGREDIENTS_PATH, 'rb') as file:
+            digest.update(file.read())
+        digest.update(json.dumps(
+            [TAGS, admin_username, admin_email], ensure_ascii=False
+        ).encode())
+        return digest.hexdigest()
+
+    def seed(self, admin_username, admin_email, admin_password):
+        """Загружает начальные данные, если их источник изменился.
+
+        База, заполненная до появления отпечатков, считается загруженной:
+        отпечаток сохраняется без повторной загрузки.
+        """
         User = get_user_model()
-        if User.objects.exists():
+        fingerprint = self.seed_fingerprint(admin_username, admin_email)
+        stored = self.get_fingerprint('seed')
+        if not self.force and stored is None and User.objects.exists():
+            self.set_fingerprint('seed', fingerprint)
+            stored = fingerprint
+        if not self.force and stored == fingerprint:
             self.stdout.write(
                 self.style.WARNING(
                     'Данные уже существуют в базе данных. Пропуск загрузки.'
                 )
             )
-        else:
-            self.stdout.write('Загрузка данных из CSV...')
-            call_command('loadcsv')
+            return
+
+        self.stdout.write('Загрузка данных из CSV...')
+        call_command('loadcsv', path=INGREDIENTS_PATH)
 
-            self.stdout.write('Создание суперпользователя...')
-            if not User.objects.filter(username=admin_username).exists():
-                User.objects.create_superuser(
-                    admin_username, admin_email, admin_password
+        self.stdout.write('Создание суперпользователя...')
+        if not User.objects.filter(
+            Q(username=admin_username) | Q(email=admin_email)
+        ).exists():
+            User.objects.create_superuser(
+                admin_username, admin_email, admin_password
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Суперпользователь {admin_username} создан.')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Пользователь {admin_username} или {admin_email} '
+                    'уже существует.'
                 )
+            )
+
+        self.stdout.write('Создание тегов...')
+        for tag_data in TAGS:
+            # Поиск по slug: название тега могли поменять в админке.
+            tag, created = Tag.objects.get_or_create(
+                slug=tag_data['slug'], defaults={'name': tag_data['name']}
+            )
+            if created:
                 self.stdout.write(
                     self.style.SUCCESS(
-                        f'Суперпользователь {admin_username} создан.')
+                        f'Тег "{tag_data["name"]}" успешно создан.')
                 )
             else:
                 self.stdout.write(
                     self.style.WARNING(
-                        f'Суперпользователь {admin_username} уже существует.'
-                    )
+                        f'Тег "{tag_data["name"]}" уже существует.')
                 )
+        self.set_fingerprint('seed', fingerprint)
 
-            self.stdout.write('Создание тегов...')
-            tags = [
-                {'name': 'Завтрак', 'slug': 'breakfast'},
-                {'name': 'Обед', 'slug': 'lunch'},
-                {'name': 'Ужин', 'slug': 'dinner'},
-            ]
-            for tag_data in tags:
-                tag, created = Tag.objects.get_or_create(**tag_data)
-                if created:
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Тег "{tag_data["name"]}" успешно создан.')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Тег "{tag_data["name"]}" уже существует.')
-                    )
+    def static_fingerprint(self):
+        """Отпечаток исходной статики по путям, размерам и mtime файлов."""
+        ignore_patterns = apps.get_app_config('staticfiles').ignore_patterns
+        entries = []
+        for finder in get_finders():
+            for path, storage in finder.list(ignore_patterns):
+                stat = os.stat(storage.path(path))
+                entries.append(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}')
+        entries.append(settings.STATICFILES_STORAGE)
+        return hashlib.sha256('\n'.join(sorted(entries)).encode()).hexdigest()
 
+    def collect_static(self):
+        """Собирает статику, если она изменилась с прошлого запуска."""
+        fingerprint = self.static_fingerprint()
+        hash_path = os.path.join(settings.STATIC_ROOT, STATIC_HASH_FILE)
+        try:
+            with open(hash_path, encoding='utf-8') as file:
+                collected = file.read().strip()
+        except OSError:
+            collected = None
+        if not self.force and collected == fingerprint:
+            self.stdout.write('Статика не изменилась. Пропуск.')
+            return
         call_command('collectstatic', '--noinput')
+        with open(hash_path, 'w', encoding='utf-8') as file:
+            file.write(fingerprint)
         self.stdout.write(self.style.SUCCESS('Статика успешно собрана.'))
@@ -0,0 +1,85 @@
+import time
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.core.management import BaseCommand
+from django.db.models import Q
+from recipes.constants import SIMILAR_RECIPES_COUNT
+from recipes.models import SimilarityRefresh
+from recipes.similarity import RecipeVectors, store_neighbours
+
+QUEUE_DELETE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитать похожие рецепты по TF-IDF векторам ингредиентов '
+        'и тегов и сохранить ближайших соседей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=SIMILAR_RECIPES_COUNT,
+            help='Количество сохраняемых соседей рецепта',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=0,
+            help=(
+                'Количество рецептов в пачке, по умолчанию подбирается '
+                'по размеру матрицы'
+            ),
+        )
+        parser.add_argument(
+            '--tag-weight', type=float, default=0.5,
+            help='Вес тегов относительно ингредиентов',
+        )
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Пересчитать только изменённые рецепты из очереди',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        queued = list(SimilarityRefresh.objects.values_list(
+            'recipe_id', 'queued_at'
+        ))
+        if options['stale'] and not queued:
+            self.stdout.write('Очередь пересчёта пуста.')
+            return
+
+        vectors = RecipeVectors(tag_weight=options['tag_weight'])
+        positions = (
+            vectors.positions([recipe_id for recipe_id, _ in queued])
+            if options['stale']
+            else np.arange(len(vectors))
+        )
+        batch_size = options['batch_size'] or vectors.batch_size()
+        stored = 0
+        for start in range(0, len(positions), batch_size):
+            stored += store_neighbours(vectors.neighbours(
+                positions[start:start + batch_size], options['top']
+            ))
+            self.stdout.write(
+                f'Рецепты: {min(start + batch_size, len(positions))}'
+                f'/{len(positions)}'
+            )
+        self.clear_queue(queued)
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено {stored} пар похожих рецептов за '
+            f'{time.monotonic() - started:.1f} с.'
+        ))
+
+    def clear_queue(self, queued):
+        """Удаляет из очереди рецепты, пересчитанные этим запуском.
+
+        Очередь очищается только после записи соседей, чтобы сбой расчёта
+        её не терял. Запись удаляется, только если queued_at не менялся:
+        правка во время расчёта оставляет рецепт в очереди.
+        """
+        for start in range(0, len(queued), QUEUE_DELETE_BATCH_SIZE):
+            SimilarityRefresh.objects.filter(reduce(or_, (
+                Q(recipe_id=recipe_id, queued_at=queued_at)
+                for recipe_id, queued_at in
+                queued[start:start + QUEUE_DELETE_BATCH_SIZE]
+            ))).delete()
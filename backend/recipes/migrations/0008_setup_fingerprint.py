@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_signatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SetupFingerprint',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Этап')),
+                ('value', models.CharField(max_length=64, verbose_name='Отпечаток')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток начальных данных',
+                'verbose_name_plural': 'Отпечатки начальных данных',
+            },
+        ),
+    ]
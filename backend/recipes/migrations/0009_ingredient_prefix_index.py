@@ -0,0 +1,51 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:58
+
+from django.db import migrations
+import django.db.models.functions.text
+import recipes.models
+
+OLD_INGREDIENT_PREFIX_INDEX = 'ingredient_name_upper_like_idx'
+
+
+def drop_old_ingredient_prefix_index(apps, schema_editor):
+    # Индекс из 0003 создавался вручную и заменён ingredient_name_upper_idx.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'DROP INDEX IF EXISTS {OLD_INGREDIENT_PREFIX_INDEX}'
+    )
+
+
+def create_old_ingredient_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {OLD_INGREDIENT_PREFIX_INDEX} '
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_setup_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='subscribe',
+            name='subscribe_author_user_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=recipes.models.PatternOpsIndex(django.db.models.functions.text.Upper('name'), name='ingredient_name_upper_idx'),
+        ),
+        migrations.RunPython(
+            drop_old_ingredient_prefix_index,
+            create_old_ingredient_prefix_index,
+        ),
+    ]
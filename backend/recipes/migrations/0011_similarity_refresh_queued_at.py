@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_pantry_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='similarityrefresh',
+            name='queued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Поставлен в очередь'),
+        ),
+    ]
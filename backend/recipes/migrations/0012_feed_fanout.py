@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Порог FEED_FANOUT_MAX_SUBSCRIBERS на момент миграции.
+FEED_FANOUT_MAX_SUBSCRIBERS = 1000
+
+
+def fill_feed_fanout(apps, schema_editor):
+    apps.get_model('recipes', 'User').objects.filter(
+        subscribers_count__gt=FEED_FANOUT_MAX_SUBSCRIBERS
+    ).update(feed_fanout=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_similarity_refresh_queued_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedBackfill',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_backfill', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Заполнение лент',
+                'verbose_name_plural': 'Очередь заполнения лент',
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='feed_fanout',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Рецепты копируются в ленты подписчиков'),
+        ),
+        migrations.RunPython(fill_feed_fanout, migrations.RunPython.noop),
+    ]
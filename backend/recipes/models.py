@@ -1,7 +1,12 @@
+import copy
+
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.postgres.indexes import OpClass
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 from .constants import (FIELD_MAX_LENGTH,
                         INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH,
@@ -10,9 +15,62 @@ from .constants import (FIELD_MAX_LENGTH,
                         TAG_SLUG_MAX_LENGTH, TIME_MAX_VALUE, TIME_MIN_VALUE)
 
 
-class User(AbstractUser):
+class PatternOpsIndex(models.Index):
+    """Индекс для поиска по началу строки через LIKE 'префикс%'.
+
+    В PostgreSQL выражения индексируются с классом операторов
+    varchar_pattern_ops: обычный B-tree не подходит для LIKE, если
+    локаль базы отличается от C. В остальных СУБД классов операторов
+    нет, и создаётся обычный индекс.
+    """
+
+    opclass = 'varchar_pattern_ops'
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        index = self
+        if schema_editor.connection.vendor == 'postgresql':
+            index = copy.copy(self)
+            index.expressions = tuple(
+                OpClass(expression, name=self.opclass)
+                for expression in self.expressions
+            )
+        return super(PatternOpsIndex, index).create_sql(
+            model, schema_editor, using=using, **kwargs
+        )
+
+
+class CountersMixin:
+    """Сохранение существующего объекта без денормализованных счётчиков.
+
+    Счётчики меняются атомарными UPDATE в recipes.counters, а объект,
+    загруженный раньше, хранит их устаревшие значения: полное сохранение
+    затёрло бы изменения, сделанные за это время.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args and not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     """Модель пользователя."""
 
+    # Режим ленты тоже меняется атомарными UPDATE в recipes.feeds.
+    counter_fields = ('recipes_count', 'subscribers_count', 'feed_fanout')
+
     username = models.CharField(
         max_length=NAME_MAX_LENGTH,
         unique=True,
@@ -38,6 +96,21 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Аватар',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
+    feed_fanout = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Рецепты копируются в ленты подписчиков',
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -118,14 +191,20 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        indexes = [
+            # istartswith сравнивает UPPER(name) через LIKE.
+            PatternOpsIndex(Upper('name'), name='ingredient_name_upper_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Модель рецептов."""
 
+    counter_fields = ('favorites_count', 'carts_count')
+
     name = models.CharField(
         max_length=RECIPE_NAME_MAX_LENGTH,
         verbose_name='Название',
@@ -159,11 +238,27 @@ class Recipe(models.Model):
                     MaxValueValidator(TIME_MAX_VALUE)],
         verbose_name='Время приготовления',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавления в избранное',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавления в список покупок',
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -193,6 +288,12 @@ class RecipeIngredient(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецепте'
         ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('recipe', 'ingredient', 'amount'),
+                name='recipeingredient_recipe_idx',
+            ),
+        ]
 
     def __str__(self):
         return (f'{self.recipe.name}: {self.ingredient.name} - {self.amount} '
@@ -214,6 +315,10 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites',
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -245,6 +350,10 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='carts',
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -259,3 +368,243 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} пользователем {self.user}'
+
+
+class RecipePopularity(models.Model):
+    """Модель рейтинга популярности рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='popularity',
+        verbose_name='Рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Рейтинг',
+    )
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        ordering = ('-score',)
+        indexes = [
+            models.Index(
+                fields=('-score', 'recipe'),
+                name='recipepopularity_score_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score:.2f}'
+
+
+class FeedEntry(models.Model):
+    """Модель записи ленты рецептов из подписок."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        ordering = ('-recipe',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='user_feed_recipe',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class FeedBackfill(models.Model):
+    """Модель автора, рецепты которого нужно скопировать в ленты.
+
+    Очередь разбирает команда rebuild_feeds --backfill.
+    """
+
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='feed_backfill',
+        verbose_name='Автор',
+    )
+
+    class Meta:
+        verbose_name = 'Заполнение лент'
+        verbose_name_plural = 'Очередь заполнения лент'
+
+    def __str__(self):
+        return str(self.author)
+
+
+class RecipeSimilarity(models.Model):
+    """Модель похожего рецепта из предрассчитанных соседей."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similarities',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='recipe_similar_recipe',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='recipesimilarity_score_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}: {self.score:.2f}'
+
+
+class SimilarityRefresh(models.Model):
+    """Модель рецепта, соседей которого нужно пересчитать.
+
+    queued_at обновляется при каждой правке рецепта: по нему расчёт
+    отличает правки, сделанные уже после чтения очереди.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='similarity_refresh',
+        verbose_name='Рецепт',
+    )
+    queued_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Поставлен в очередь',
+    )
+
+    class Meta:
+        verbose_name = 'Пересчёт похожих рецептов'
+        verbose_name_plural = 'Очередь пересчёта похожих рецептов'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class PantryChange(models.Model):
+    """Модель записи журнала изменений индекса «что приготовить».
+
+    Id записи — версия индекса. Запись без рецепта требует перестроить
+    индекс целиком.
+    """
+
+    recipe_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Id рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Изменение индекса продуктов'
+        verbose_name_plural = 'Журнал изменений индекса продуктов'
+
+    def __str__(self):
+        return f'{self.pk}: {self.recipe_id}'
+
+
+class RecipeSignature(models.Model):
+    """Модель MinHash-сигнатуры рецепта для поиска дубликатов."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='signature',
+        verbose_name='Рецепт',
+    )
+    minhash = models.BinaryField(
+        verbose_name='Сигнатура',
+    )
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class RecipeBucket(models.Model):
+    """Модель LSH-корзины, в которую попала полоса сигнатуры рецепта."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='buckets',
+    )
+    key = models.BigIntegerField(
+        verbose_name='Ключ корзины',
+    )
+
+    class Meta:
+        verbose_name = 'LSH-корзина рецепта'
+        verbose_name_plural = 'LSH-корзины рецептов'
+        indexes = [
+            models.Index(
+                fields=('key', 'recipe'),
+                name='recipebucket_key_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.key}'
+
+
+class SetupFingerprint(models.Model):
+    """Модель отпечатка данных, загруженных при запуске контейнера."""
+
+    name = models.CharField(
+        max_length=32,
+        primary_key=True,
+        verbose_name='Этап',
+    )
+    value = models.CharField(
+        max_length=64,
+        verbose_name='Отпечаток',
+    )
+
+    class Meta:
+        verbose_name = 'Отпечаток начальных данных'
+        verbose_name_plural = 'Отпечатки начальных данных'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
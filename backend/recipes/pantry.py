@@ -0,0 +1,256 @@
+import threading
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+from django.db.models import Max
+
+from .models import PantryChange, RecipeIngredient
+
+PANTRY_MAX_CHANGES = 1000
+# Журнал чистится при каждой PANTRY_PRUNE_EVERY-й записи.
+PANTRY_PRUNE_EVERY = 100
+PANTRY_MAX_OVERRIDES = 5000
+
+PantryMatch = namedtuple(
+    'PantryMatch', ('recipe_id', 'matched', 'total', 'missing_ids')
+)
+
+
+class InvertedIndex:
+    """Снимок индекса ингредиент -> рецепты в формате CSR.
+
+    Рецепты пронумерованы плотными позициями. Для каждого ингредиента
+    хранится отрезок массива позиций рецептов, для каждого рецепта —
+    отрезок массива его ингредиентов. Изменённые после построения рецепты
+    исключаются маской alive и хранятся в overrides как множества.
+    """
+
+    def __init__(self, pairs):
+        recipe_column, ingredient_column = pairs[:, 0], pairs[:, 1]
+        self.recipe_ids, positions = np.unique(
+            recipe_column, return_inverse=True
+        )
+        self.sizes = np.bincount(positions, minlength=len(self.recipe_ids))
+        self.alive = np.ones(len(self.recipe_ids), dtype=bool)
+        self.overrides = {}
+
+        order = np.argsort(ingredient_column, kind='stable')
+        self.ingredient_ids, starts = np.unique(
+            ingredient_column[order], return_index=True
+        )
+        self.ingredient_offsets = np.append(starts, len(order))
+        self.postings = positions[order]
+
+        order = np.argsort(positions, kind='stable')
+        self.recipe_ingredients = ingredient_column[order]
+        self.recipe_offsets = np.concatenate(([0], np.cumsum(self.sizes)))
+
+    @classmethod
+    def build(cls):
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by()
+        pairs = np.fromiter(
+            chain.from_iterable(rows.iterator()), dtype=np.int64
+        )
+        return cls(pairs.reshape(-1, 2))
+
+    def position(self, recipe_id):
+        position = np.searchsorted(self.recipe_ids, recipe_id)
+        if (
+            position < len(self.recipe_ids)
+            and self.recipe_ids[position] == recipe_id
+        ):
+            return position
+        return None
+
+    def replace(self, ingredients_by_recipe):
+        """Новый снимок с обновлёнными составами рецептов.
+
+        Пустое множество ингредиентов означает удалённый рецепт.
+        """
+        index = object.__new__(InvertedIndex)
+        index.__dict__.update(self.__dict__)
+        index.alive = self.alive.copy()
+        index.overrides = dict(self.overrides)
+        for recipe_id, ingredient_ids in ingredients_by_recipe.items():
+            position = self.position(recipe_id)
+            if position is not None:
+                index.alive[position] = False
+            index.overrides[recipe_id] = frozenset(ingredient_ids)
+        return index
+
+    def postings_for(self, ingredient_ids):
+        found = np.searchsorted(self.ingredient_ids, ingredient_ids)
+        found = found[found < len(self.ingredient_ids)]
+        found = found[np.isin(self.ingredient_ids[found], ingredient_ids)]
+        return np.concatenate([
+            self.postings[
+                self.ingredient_offsets[k]:self.ingredient_offsets[k + 1]
+            ]
+            for k in found
+        ] or [np.empty(0, dtype=np.int64)])
+
+    def search(self, ingredient_ids):
+        pantry = np.unique(np.asarray(ingredient_ids, dtype=np.int64))
+        positions, matched = np.unique(
+            self.postings_for(pantry), return_counts=True
+        )
+        live = self.alive[positions]
+        positions, matched = positions[live], matched[live]
+        recipe_ids = self.recipe_ids[positions]
+        totals = self.sizes[positions]
+
+        pantry_set = frozenset(pantry.tolist())
+        extra = [
+            (recipe_id, len(ingredients & pantry_set), len(ingredients))
+            for recipe_id, ingredients in self.overrides.items()
+            if ingredients & pantry_set
+        ]
+        if extra:
+            extra = np.array(extra, dtype=np.int64)
+            recipe_ids = np.concatenate((recipe_ids, extra[:, 0]))
+            matched = np.concatenate((matched, extra[:, 1]))
+            totals = np.concatenate((totals, extra[:, 2]))
+
+        coverage = matched / totals
+        order = np.lexsort((-recipe_ids, -matched, -coverage))
+        return PantryMatches(
+            self, pantry, recipe_ids[order], matched[order], totals[order]
+        )
+
+    def missing_ids(self, recipe_id, pantry):
+        if recipe_id in self.overrides:
+            ingredients = np.fromiter(
+                self.overrides[recipe_id], dtype=np.int64
+            )
+        else:
+            position = self.position(recipe_id)
+            ingredients = self.recipe_ingredients[
+                self.recipe_offsets[position]:
+                self.recipe_offsets[position + 1]
+            ]
+        return np.setdiff1d(ingredients, pantry).tolist()
+
+
+class PantryMatches:
+    """Отсортированные результаты поиска с ленивым подсчётом недостающего.
+
+    Поддерживает len() и срезы, поэтому передаётся в пагинатор напрямую:
+    списки недостающих ингредиентов строятся только для страницы.
+    """
+
+    def __init__(self, index, pantry, recipe_ids, matched, totals):
+        self.index = index
+        self.pantry = pantry
+        self.recipe_ids = recipe_ids
+        self.matched = matched
+        self.totals = totals
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [
+                self[position]
+                for position in range(*key.indices(len(self)))
+            ]
+        recipe_id = int(self.recipe_ids[key])
+        return PantryMatch(
+            recipe_id,
+            int(self.matched[key]),
+            int(self.totals[key]),
+            self.index.missing_ids(recipe_id, self.pantry),
+        )
+
+
+class PantryIndex:
+    """Индекс «что приготовить» в памяти процесса.
+
+    Строится целиком при первом запросе. Изменения рецептов записываются
+    в базу как журнал версий PantryChange, и каждый процесс перед поиском
+    дочитывает журнал и обновляет только изменённые рецепты. Если в
+    журнале пропуск, запись о полной перестройке или он слишком длинный,
+    индекс перестраивается полностью.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+
+    def get_version(self):
+        return PantryChange.objects.aggregate(
+            version=Max('id')
+        )['version'] or 0
+
+    def rebuild(self):
+        version = self.get_version()
+        self.index = InvertedIndex.build()
+        self.version = version
+
+    def sync(self):
+        version = self.get_version()
+        if self.index is not None and version == self.version:
+            return
+        with self.lock:
+            if self.index is None or not (
+                0 <= version - self.version <= PANTRY_MAX_CHANGES
+            ):
+                self.rebuild()
+                return
+            # Пропуск в id — запись, ещё не видимая этому процессу,
+            # или вычищенный журнал.
+            recipe_ids = list(PantryChange.objects.filter(
+                id__gt=self.version, id__lte=version
+            ).values_list('recipe_id', flat=True))
+            if len(recipe_ids) < version - self.version or (
+                None in recipe_ids
+            ):
+                self.rebuild()
+                return
+            recipe_ids = set(recipe_ids)
+            if len(self.index.overrides) + len(recipe_ids) > (
+                PANTRY_MAX_OVERRIDES
+            ):
+                self.rebuild()
+                return
+            ingredients_by_recipe = {
+                recipe_id: set() for recipe_id in recipe_ids
+            }
+            for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id'):
+                ingredients_by_recipe[recipe_id].add(ingredient_id)
+            self.index = self.index.replace(ingredients_by_recipe)
+            self.version = version
+
+    def search(self, ingredient_ids):
+        self.sync()
+        return self.index.search(ingredient_ids)
+
+
+pantry_index = PantryIndex()
+
+
+def add_pantry_change(recipe_id):
+    version = PantryChange.objects.create(recipe_id=recipe_id).pk
+    if version % PANTRY_PRUNE_EVERY == 0:
+        # Отставшие больше чем на PANTRY_MAX_CHANGES процессы всё равно
+        # перестраивают индекс целиком.
+        PantryChange.objects.filter(
+            id__lte=version - PANTRY_MAX_CHANGES
+        ).delete()
+    return version
+
+
+def recipe_changed(recipe_id):
+    """Записывает изменение состава рецепта в журнал индекса."""
+    add_pantry_change(recipe_id)
+
+
+def invalidate_pantry():
+    """Заставляет все процессы перестроить индекс целиком."""
+    add_pantry_change(None)
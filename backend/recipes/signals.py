@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caches import (clear_ingredient_lists, clear_recipe_first_page,
+                     clear_tag_ids, clear_tag_list, clear_user_recipe_ids)
+from .counters import update_counters
+from .duplicates import index_recipes
+from .feeds import add_author_to_feed, fan_out_recipe, remove_author_from_feed
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     SimilarityRefresh, Subscribe, Tag)
+from .pantry import invalidate_pantry, recipe_changed
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def user_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: clear_user_recipe_ids(sender, instance.user_id)
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipe_removed(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: clear_user_recipe_ids(sender, instance.user_id)
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    transaction.on_commit(clear_tag_ids)
+    transaction.on_commit(clear_tag_list)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    transaction.on_commit(clear_ingredient_lists)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_list_changed(sender, created, **kwargs):
+    if created:
+        transaction.on_commit(clear_recipe_first_page)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_list_deleted(sender, **kwargs):
+    transaction.on_commit(clear_recipe_first_page)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscribe)
+def counted_object_created(sender, instance, created, **kwargs):
+    if created:
+        update_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscribe)
+def counted_object_deleted(sender, instance, **kwargs):
+    update_counters(sender, instance, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out_recipe(instance))
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: add_author_to_feed(
+            instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_deleted(sender, instance, **kwargs):
+    # Регистрируется после counted_object_deleted: лента проверяет уже
+    # уменьшенный счётчик подписчиков.
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_composition_changed(sender, instance, **kwargs):
+    # Ингредиенты сохраняются после рецепта, поэтому индекс читает
+    # их состав только после фиксации транзакции.
+    recipe_id = instance.id
+    transaction.on_commit(lambda: recipe_changed(recipe_id))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, **kwargs):
+    transaction.on_commit(invalidate_pantry)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_similarity_outdated(sender, instance, **kwargs):
+    SimilarityRefresh.objects.bulk_create(
+        [SimilarityRefresh(recipe=instance)], update_conflicts=True,
+        unique_fields=('recipe',), update_fields=('queued_at',),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_signature_outdated(sender, instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(lambda: index_recipes([recipe_id]))
@@ -0,0 +1,127 @@
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .models import Recipe, RecipeIngredient, RecipeSimilarity
+
+SIMILARITY_MAX_CELLS = 2 ** 25
+SIMILARITY_MAX_BATCH = 1000
+
+
+def fetch_pairs(queryset, *fields):
+    rows = queryset.values_list(*fields).order_by()
+    pairs = np.fromiter(
+        chain.from_iterable(rows.iterator()), dtype=np.int64
+    )
+    return pairs.reshape(-1, 2)
+
+
+class RecipeVectors:
+    """TF-IDF векторы рецептов по ингредиентам и тегам.
+
+    Строки разреженной матрицы — рецепты в порядке возрастания id,
+    столбцы — ингредиенты, а за ними теги с весом tag_weight. Строки
+    нормированы, поэтому скалярное произведение равно косинусу.
+    """
+
+    def __init__(self, tag_weight=0.5):
+        ingredients = fetch_pairs(
+            RecipeIngredient.objects.all(), 'recipe_id', 'ingredient_id'
+        )
+        tags = fetch_pairs(
+            Recipe.tags.through.objects.all(), 'recipe_id', 'tag_id'
+        )
+        self.recipe_ids, rows = np.unique(
+            np.concatenate((ingredients[:, 0], tags[:, 0])),
+            return_inverse=True,
+        )
+        ingredient_ids, ingredient_columns = np.unique(
+            ingredients[:, 1], return_inverse=True
+        )
+        _, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+        columns = np.concatenate((
+            ingredient_columns, tag_columns + len(ingredient_ids)
+        ))
+        weights = np.concatenate((
+            np.ones(len(ingredients), dtype=np.float32),
+            np.full(len(tags), tag_weight, dtype=np.float32),
+        ))
+
+        recipes_total = len(self.recipe_ids)
+        frequency = np.bincount(columns)
+        idf = np.log((1 + recipes_total) / (1 + frequency)) + 1
+        weights *= idf[columns].astype(np.float32)
+        norms = np.sqrt(np.bincount(
+            rows, weights=weights ** 2, minlength=recipes_total
+        ))
+        weights /= norms[rows].astype(np.float32)
+        self.matrix = sparse.csr_matrix(
+            (weights, (rows, columns)),
+            shape=(recipes_total, len(frequency)),
+        )
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def positions(self, recipe_ids):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        positions = positions[positions < len(self)]
+        return positions[np.isin(self.recipe_ids[positions], recipe_ids)]
+
+    def batch_size(self):
+        return min(
+            max(SIMILARITY_MAX_CELLS // max(len(self), 1), 1),
+            SIMILARITY_MAX_BATCH,
+        )
+
+    def neighbours(self, positions, top):
+        """Для строк positions возвращает top самых похожих рецептов."""
+        top = min(top, len(self) - 1)
+        if top <= 0:
+            return {}
+        # Теги есть почти у всех рецептов, поэтому строки сходства
+        # плотные, и разреженная матрица на плотный блок быстрее, чем
+        # произведение двух разреженных.
+        block = self.matrix[positions].toarray()
+        scores = np.ascontiguousarray((self.matrix @ block.T).T)
+        scores[np.arange(len(positions)), positions] = 0
+        best = np.argpartition(scores, len(self) - top, axis=1)[:, -top:]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        return {
+            int(self.recipe_ids[position]): [
+                (int(self.recipe_ids[similar]), float(score))
+                for similar, score in zip(row, row_scores) if score > 0
+            ]
+            for position, row, row_scores in zip(
+                positions, best, best_scores
+            )
+        }
+
+
+def store_neighbours(neighbours):
+    """Заменяет сохранённых соседей рецептов одной транзакцией."""
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe_id__in=neighbours).delete()
+        # Рецепты могли удалить, пока считались соседи.
+        existing = set(Recipe.objects.filter(
+            id__in=set(neighbours).union(
+                similar_id
+                for similar in neighbours.values()
+                for similar_id, _ in similar
+            )
+        ).values_list('id', flat=True))
+        return len(RecipeSimilarity.objects.bulk_create([
+            RecipeSimilarity(
+                recipe_id=recipe_id, similar_id=similar_id, score=score
+            )
+            for recipe_id, similar in neighbours.items()
+            if recipe_id in existing
+            for similar_id, score in similar
+            if similar_id in existing
+        ]))
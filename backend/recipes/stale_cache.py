@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from foodgram.db_routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_KEY = '{key}:refresh'
+REFRESH_LOCK_TIMEOUT = 30
+REFRESH_RETRY_INTERVAL = 5
+REFRESH_WAIT_INTERVAL = 0.05
+# Сколько ждать значения, которое считает другой процесс, прежде чем
+# посчитать его самому: порядка обычного времени расчёта.
+REFRESH_WAIT_TIMEOUT = 2
+
+# Блокировка живёт, пока её держит или ждёт хотя бы один поток.
+_refresh_locks = weakref.WeakValueDictionary()
+_refresh_locks_guard = threading.Lock()
+
+
+def get_refresh_lock(key):
+    with _refresh_locks_guard:
+        lock = _refresh_locks.get(key)
+        if lock is None:
+            lock = _refresh_locks[key] = threading.Lock()
+        return lock
+
+
+def store(key, value, soft_timeout, hard_timeout):
+    now = time.time()
+    cache.set(
+        key, (value, now + soft_timeout, now + hard_timeout), hard_timeout
+    )
+    return value
+
+
+def get_or_refresh(key, build, soft_timeout, hard_timeout):
+    """Значение из кеша, которое пересчитывает только один вызывающий.
+
+    Значение моложе soft_timeout возвращается сразу. Устаревшее значение
+    пересчитывает один вызывающий на ключ — в процессе под блокировкой
+    потока, между процессами под ключом-блокировкой в кеше, а остальные
+    получают устаревшее. Если build() падает, устаревшее значение
+    отдаётся и дальше, но не дольше hard_timeout с последнего успешного
+    расчёта, а новая попытка делается раз в REFRESH_RETRY_INTERVAL.
+    Если значения в кеше нет, вызывающие ждут того, кто его считает,
+    но не дольше REFRESH_WAIT_TIMEOUT, после чего считают сами.
+    build() читает основную базу.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return build_missing(key, build, soft_timeout, hard_timeout)
+    if time.time() < entry[1]:
+        return entry[0]
+    return refresh_stale(key, entry, build, soft_timeout, hard_timeout)
+
+
+async def aget_or_refresh(key, build, soft_timeout, hard_timeout):
+    """Асинхронный вариант get_or_refresh: пересчёт выполняется в потоке.
+
+    Ожидание чужого расчёта не занимает поток для синхронного кода.
+    """
+    entry = await cache.aget(key)
+    if entry is None:
+        return await abuild_missing(key, build, soft_timeout, hard_timeout)
+    if time.time() < entry[1]:
+        return entry[0]
+    return await sync_to_async(refresh_stale)(
+        key, entry, build, soft_timeout, hard_timeout
+    )
+
+
+def refresh_stale(key, entry, build, soft_timeout, hard_timeout):
+    value, _, expires = entry
+    lock = get_refresh_lock(key)
+    if not lock.acquire(blocking=False):
+        return value
+    lock_key = REFRESH_LOCK_KEY.format(key=key)
+    try:
+        if not cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT):
+            return value
+        try:
+            return build_and_store(key, build, soft_timeout, hard_timeout)
+        except Exception:
+            logger.exception(
+                'Не удалось пересчитать %s, отдаётся устаревшее значение',
+                key,
+            )
+            now = time.time()
+            if expires > now:
+                cache.set(
+                    key, (value, now + REFRESH_RETRY_INTERVAL, expires),
+                    expires - now,
+                )
+            return value
+        finally:
+            cache.delete(lock_key)
+    finally:
+        lock.release()
+
+
+def build_and_store(key, build, soft_timeout, hard_timeout):
+    with use_primary():
+        value = build()
+    return store(key, value, soft_timeout, hard_timeout)
+
+
+def build_locally(key, build, soft_timeout, hard_timeout):
+    """Расчёт без блокировки в кеше, один на ключ в процессе."""
+    with get_refresh_lock(key):
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        return build_and_store(key, build, soft_timeout, hard_timeout)
+
+
+def build_missing(key, build, soft_timeout, hard_timeout):
+    lock_key = REFRESH_LOCK_KEY.format(key=key)
+    with get_refresh_lock(key):
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT):
+            try:
+                return build_and_store(key, build, soft_timeout, hard_timeout)
+            finally:
+                cache.delete(lock_key)
+    # Значение считает другой процесс: ждём его без блокировки потоков.
+    deadline = time.monotonic() + REFRESH_WAIT_TIMEOUT
+    while True:
+        time.sleep(REFRESH_WAIT_INTERVAL)
+        # Блокировка читается первой: снятая после чтения значения
+        # означала бы значение, пропущенное между двумя чтениями.
+        building = cache.get(lock_key)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if not building or time.monotonic() >= deadline:
+            break
+    # Другой процесс не успел, не смог посчитать или сохранить значение.
+    return build_locally(key, build, soft_timeout, hard_timeout)
+
+
+async def abuild_missing(key, build, soft_timeout, hard_timeout):
+    lock_key = REFRESH_LOCK_KEY.format(key=key)
+    if await cache.aadd(lock_key, True, REFRESH_LOCK_TIMEOUT):
+        try:
+            return await sync_to_async(build_and_store)(
+                key, build, soft_timeout, hard_timeout
+            )
+        finally:
+            await cache.adelete(lock_key)
+    deadline = time.monotonic() + REFRESH_WAIT_TIMEOUT
+    while True:
+        await asyncio.sleep(REFRESH_WAIT_INTERVAL)
+        building = await cache.aget(lock_key)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry[0]
+        if not building or time.monotonic() >= deadline:
+            break
+    return await sync_to_async(build_locally)(
+        key, build, soft_timeout, hard_timeout
+    )
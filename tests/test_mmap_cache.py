@@ -0,0 +1,67 @@
+import logging
+import multiprocessing
+
+import pytest
+from recipes.management.commands.cache_benchmark import (STRESS_COUNTER_KEY,
+                                                         create_cache,
+                                                         stress_worker)
+
+PROCESSES = 4
+OPERATIONS = 2000
+SLOTS = 1024
+SLOT_SIZE = 4096
+VALUE_SIZE = 1024
+
+
+@pytest.fixture
+def mmap_cache(tmp_path):
+    return create_cache('mmap', str(tmp_path), SLOTS, SLOT_SIZE)
+
+
+def test_concurrent_processes_keep_counter_and_values(tmp_path, mmap_cache):
+    """Процессы одновременно увеличивают счётчик и пишут значения.
+
+    Ни один инкремент не теряется, а прочитанные значения чужих
+    процессов совпадают с записанными.
+    """
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    mmap_cache.set(STRESS_COUNTER_KEY, 0)
+    processes = [
+        context.Process(target=stress_worker, args=(
+            'mmap', str(tmp_path), SLOTS, SLOT_SIZE, worker, PROCESSES,
+            OPERATIONS, VALUE_SIZE, queue,
+        ))
+        for worker in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    corrupted = [queue.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=10)
+        assert process.exitcode == 0
+    assert mmap_cache.get(STRESS_COUNTER_KEY) == PROCESSES * OPERATIONS
+    assert sum(corrupted) == 0
+
+
+def test_value_is_shared_between_instances(tmp_path):
+    """Два экземпляра кеша на одном каталоге видят записи друг друга."""
+    first = create_cache('mmap', str(tmp_path), SLOTS, SLOT_SIZE)
+    second = create_cache('mmap', str(tmp_path), SLOTS, SLOT_SIZE)
+    first.set('shared', {'value': 1})
+    assert second.get('shared') == {'value': 1}
+    second.delete('shared')
+    assert first.get('shared') is None
+
+
+def test_oversized_value_is_not_cached_and_logged(mmap_cache, caplog):
+    """Значение больше слота не кешируется, о ключе есть предупреждение."""
+    mmap_cache.set('oversized', 'small')
+    with caplog.at_level(logging.WARNING, logger='foodgram.mmap_cache'):
+        mmap_cache.set('oversized', b'x' * SLOT_SIZE)
+        mmap_cache.set('oversized', b'x' * SLOT_SIZE)
+    assert mmap_cache.get('oversized') is None
+    warnings = [
+        record for record in caplog.records if 'oversized' in record.message
+    ]
+    assert len(warnings) == 1
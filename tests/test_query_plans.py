@@ -0,0 +1,68 @@
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from recipes.management.commands.explain_queries import Command
+
+INGREDIENTS_PATH = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
+# В SQLite LIKE не учитывает регистр и не использует индексы по UPPER(name).
+SQLITE_SCANNED_QUERIES = {'Ингредиенты по началу названия'}
+
+
+@pytest.fixture
+def hot_queries(db):
+    call_command(
+        'generate_data', users=30, recipes=200, path=INGREDIENTS_PATH,
+        stdout=StringIO(),
+    )
+    return Command().get_queries()
+
+
+@pytest.fixture
+def explain(hot_queries):
+    """EXPLAIN, в котором перебор остаётся только при отсутствии индекса.
+
+    На маленьких тестовых таблицах PostgreSQL иначе выбрал бы перебор
+    и при наличии подходящего индекса.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+    yield lambda queryset: queryset.explain()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+
+def test_hot_queries_use_indexes(hot_queries, explain):
+    """Горячие запросы читают большие таблицы через индексы."""
+    command = Command()
+    scanned = {}
+    for name, queryset in hot_queries:
+        if connection.vendor == 'sqlite' and name in SQLITE_SCANNED_QUERIES:
+            continue
+        tables = command.get_full_scans(explain(queryset))
+        if tables:
+            scanned[name] = tables
+    assert scanned == {}
+
+
+@pytest.mark.parametrize('plan, tables', [
+    ('SEARCH recipes_favorite USING INDEX favorite_idx (recipe_id=?)', set()),
+    ('SEARCH recipes_recipe USING INTEGER PRIMARY KEY (rowid=?)', set()),
+    ('SCAN recipes_ingredient', {'recipes_ingredient'}),
+    (
+        'SCAN recipes_favorite USING COVERING INDEX favorite_idx',
+        {'recipes_favorite'},
+    ),
+    ('SCAN TABLE recipes_recipe', {'recipes_recipe'}),
+    ('SCAN CONSTANT ROW', set()),
+    ('SCAN SUBQUERY 1', set()),
+])
+def test_sqlite_full_scans(monkeypatch, plan, tables):
+    """Перебором считается любой SCAN, поиском по индексу — SEARCH."""
+    monkeypatch.setattr(connection, 'vendor', 'sqlite')
+    assert Command().get_full_scans(plan) == tables